@@ -1,4 +1,6 @@
 import logging
+import math
+import multiprocessing as mp
 
 from tqdm import tqdm
 
@@ -25,6 +27,7 @@ class Arena():
         self.player2 = player2
         self.game = game
         self.display = display
+        self.gamesPlayed = 0  # number of games played by the last playGames call
 
     def playGame(self, verbose=False):
         """
@@ -39,13 +42,14 @@ class Arena():
         players = [self.player2, None, self.player1]
         curPlayer = 1
         board = self.game.getInitBoard()
+        action = None
         it = 0
 
         for player in players[0], players[2]:
             if hasattr(player, "startGame"):
                 player.startGame()
 
-        while self.game.getGameEnded(board, curPlayer) == 0:
+        while self.game.getGameEnded(board, curPlayer, action) == 0:
             it += 1
             if verbose:
                 assert self.display
@@ -73,14 +77,20 @@ class Arena():
 
         if verbose:
             assert self.display
-            print("Game over: Turn ", str(it), "Result ", str(self.game.getGameEnded(board, 1)))
+            print("Game over: Turn ", str(it), "Result ", str(self.game.getGameEnded(board, 1, action)))
             self.display(board)
-        return curPlayer * self.game.getGameEnded(board, curPlayer)
+        return curPlayer * self.game.getGameEnded(board, curPlayer, action)
 
-    def playGames(self, num, verbose=False):
+    def playGames(self, num, verbose=False, updateThreshold=None, sprt=None):
         """
         Plays num games in which player1 starts num/2 games and player2 starts
-        num/2 games.
+        num/2 games: player1 starts the first half, unless an SPRT is given,
+        in which case the players alternate.
+
+        If updateThreshold is given, stops as soon as the remaining games can
+        no longer change whether twoWon / (oneWon + twoWon) reaches it. If an
+        SPRT is given, also stops as soon as it accepts one of its hypotheses
+        about player2. The number of games played is left in gamesPlayed.
 
         Returns:
             oneWon: games won by player1
@@ -89,27 +99,208 @@ class Arena():
         """
 
         num = int(num / 2)
+        # With an SPRT, which may stop after any game, the players take turns
+        # starting so that every sample is balanced, as in ParallelArena
+        swaps = [False, True] * num if sprt is not None else [False] * num + [True] * num
         oneWon = 0
         twoWon = 0
         draws = 0
-        for _ in tqdm(range(num), desc="Arena.playGames (1)"):
-            gameResult = self.playGame(verbose=verbose)
+        self.gamesPlayed = 0
+        for i, swapped in enumerate(tqdm(swaps, desc="Arena.playGames")):
+            if swapped:
+                self.player1, self.player2 = self.player2, self.player1
+                gameResult = -self.playGame(verbose=verbose)  # from the point of view of player1
+                self.player1, self.player2 = self.player2, self.player1
+            else:
+                gameResult = self.playGame(verbose=verbose)
             if gameResult == 1:
                 oneWon += 1
             elif gameResult == -1:
                 twoWon += 1
             else:
                 draws += 1
+            self.gamesPlayed += 1
+            if shouldStop(oneWon, twoWon, draws, 2 * num - i - 1, updateThreshold, sprt):
+                break
 
-        self.player1, self.player2 = self.player2, self.player1
+        return oneWon, twoWon, draws
 
-        for _ in tqdm(range(num), desc="Arena.playGames (2)"):
-            gameResult = self.playGame(verbose=verbose)
-            if gameResult == -1:
-                oneWon += 1
-            elif gameResult == 1:
-                twoWon += 1
-            else:
-                draws += 1
 
-        return oneWon, twoWon, draws
\ No newline at end of file
+def isDecided(oneWon, twoWon, remaining, updateThreshold):
+    """
+    Returns True if, whatever the results of the remaining games, it is
+    already known whether twoWon / (oneWon + twoWon) >= updateThreshold. No
+    decisive game at all counts as not reaching the threshold.
+    """
+    total = oneWon + twoWon + remaining
+    if total == 0 or (twoWon + remaining) / total < updateThreshold:
+        return True  # cannot reach the threshold even winning every remaining game
+    return oneWon + twoWon > 0 and twoWon / total >= updateThreshold  # reaches it even losing them all
+
+
+def shouldStop(oneWon, twoWon, draws, remaining, updateThreshold=None, sprt=None):
+    """
+    Returns True if playGames can stop before the remaining games: either
+    the updateThreshold decision is known (see isDecided) or the sprt has
+    accepted a hypothesis about player2.
+    """
+    if updateThreshold is not None and isDecided(oneWon, twoWon, remaining, updateThreshold):
+        return True
+    return sprt is not None and sprt.decide(twoWon, draws, oneWon) is not None
+
+
+class SPRT():
+    """
+    Sequential probability ratio test on the Elo difference of a player
+    against its opponent, using the normal approximation of the score per
+    game (win = 1, draw = 1/2, loss = 0) as in engine testing frameworks.
+
+    H0 is elo <= elo0, H1 is elo >= elo1; alpha and beta are the error rates
+    for wrongly accepting H1 and H0. Half a game of each kind is added to
+    the counts, so that a run of wins gives a finite variance.
+    """
+
+    def __init__(self, elo0=0, elo1=70, alpha=0.05, beta=0.05):
+        self.score0 = scoreFromElo(elo0)
+        self.score1 = scoreFromElo(elo1)
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+
+    def estimate(self, wins, draws, losses):
+        """
+        Returns:
+            score: mean score per game
+            var: variance of the score of one game
+            n: number of games, including the added half games
+        """
+        wins, draws, losses = wins + 0.5, draws + 0.5, losses + 0.5
+        n = wins + draws + losses
+        score = (wins + 0.5 * draws) / n
+        var = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+        return score, var, n
+
+    def llr(self, wins, draws, losses):
+        """
+        Returns the log-likelihood ratio of H1 against H0.
+        """
+        score, var, n = self.estimate(wins, draws, losses)
+        return n * (self.score1 - self.score0) * (2 * score - self.score0 - self.score1) / (2 * var)
+
+    def decide(self, wins, draws, losses):
+        """
+        Returns True if H1 is accepted, False if H0 is accepted and None if
+        more games are needed.
+        """
+        if wins + draws + losses == 0:
+            return None
+        llr = self.llr(wins, draws, losses)
+        if llr >= self.upper:
+            return True
+        if llr <= self.lower:
+            return False
+        return None
+
+    def elo(self, wins, draws, losses):
+        """
+        Returns:
+            elo: estimated Elo difference
+            margin: half width of its 95% confidence interval
+        """
+        score, var, n = self.estimate(wins, draws, losses)
+        margin = 1.96 * math.sqrt(var / n)
+        elo = eloFromScore(score)
+        return elo, (eloFromScore(min(score + margin, 1 - 1e-6)) - eloFromScore(max(score - margin, 1e-6))) / 2
+
+
+def scoreFromElo(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def eloFromScore(score):
+    return -400 * math.log10(1 / score - 1)
+
+
+def _arenaWorker(player1, player2, game, tasks, results):
+    """
+    Entry point of an Arena process. Builds both players once, then plays the
+    games read from tasks until it reads None. The result of every game is
+    put on results from the point of view of player1.
+    """
+    player1, player2 = player1(), player2()
+    arena = Arena(player1, player2, game)
+    swappedArena = Arena(player2, player1, game)
+
+    while True:
+        swapped = tasks.get()
+        if swapped is None:
+            break
+        if swapped:
+            results.put(-swappedArena.playGame())
+        else:
+            results.put(arena.playGame())
+
+
+class ParallelArena(Arena):
+    """
+    An Arena that spreads its games over numWorkers processes.
+
+    player1 and player2 are not players but picklable functions without
+    arguments that return one, e.g. a functools.partial of
+    MCTSPlayer.fromCheckpoint. Each worker calls them once to build its own
+    pair of players.
+    """
+
+    def __init__(self, player1, player2, game, numWorkers):
+        super().__init__(player1, player2, game)
+        self.numWorkers = numWorkers
+
+    def playGames(self, num, verbose=False, updateThreshold=None, sprt=None):
+        """
+        Plays num games in which player1 starts num/2 games and player2 starts
+        num/2 games, in parallel. The two halves are interleaved, so that an
+        early stop (see Arena.playGames) happens after a balanced sample.
+
+        Returns:
+            oneWon: games won by player1
+            twoWon: games won by player2
+            draws:  games won by nobody
+        """
+        assert not verbose, "verbose is not supported by ParallelArena"
+
+        num = int(num / 2)
+        ctx = mp.get_context('spawn')  # TensorFlow is not safe to use in forked processes
+        tasks = ctx.Queue()
+        results = ctx.Queue()
+        for _ in range(num):
+            tasks.put(False)
+            tasks.put(True)
+        workers = [ctx.Process(target=_arenaWorker, args=(self.player1, self.player2, self.game, tasks, results),
+                               daemon=True) for _ in range(self.numWorkers)]
+        for worker in workers:
+            tasks.put(None)
+            worker.start()
+
+        oneWon = 0
+        twoWon = 0
+        draws = 0
+        self.gamesPlayed = 0
+        try:
+            for i in tqdm(range(2 * num), desc="Arena.playGames"):
+                gameResult = results.get()
+                if gameResult == 1:
+                    oneWon += 1
+                elif gameResult == -1:
+                    twoWon += 1
+                else:
+                    draws += 1
+                self.gamesPlayed += 1
+                if shouldStop(oneWon, twoWon, draws, 2 * num - i - 1, updateThreshold, sprt):
+                    log.info(f'Arena decided after {i + 1} of {2 * num} games')
+                    break
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+                worker.join()
+
+        return oneWon, twoWon, draws
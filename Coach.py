@@ -1,15 +1,20 @@
 import logging
 import os
+import shutil
 import sys
+import time
 from collections import deque
-from pickle import Pickler, Unpickler
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pickle import Unpickler
 from random import shuffle
 
-import numpy as np
 from tqdm import tqdm
 
-from Arena import Arena
-from MCTS import MCTS
+from Arena import Arena, ParallelArena, SPRT
+from MCTS import MCTS, MCTSPlayer
+from ReplayBuffer import ReplayBuffer
+from SelfPlay import SelfPlayPool, executeEpisode, seedEpisode
 
 log = logging.getLogger(__name__)
 
@@ -25,47 +30,47 @@ class Coach:
         self.pnet = self.nnet.__class__(self.game)  # the competitor network
         self.args = args
         self.mcts = MCTS(self.game, self.nnet, self.args)
-        self.trainExamplesHistory = []  # history of examples from args.numItersForTrainExamplesHistory latest iterations
+        # history of examples from args.numItersForTrainExamplesHistory latest iterations
+        self.replayBuffer = ReplayBuffer(os.path.join(self.args.checkpoint, 'replay'), self.args.numItersForTrainExamplesHistory)
         self.skipFirstSelfPlay = False  # can be overridden in loadTrainExamples()
+        self.selfPlayPool = None  # worker processes, when args.numSelfPlayWorkers > 1 or args.pipelined
 
     def executeEpisode(self):
         """
-        This function executes one episode of self-play, starting with player 1.
-        As the game is played, each turn is added as a training example to
-        trainExamples. The game is played till the game ends. After the game
-        ends, the outcome of the game is used to assign values to each example
-        in trainExamples.
-
-        It uses a temp=1 if episodeStep < tempThreshold, and thereafter
-        uses temp=0.
+        This function executes one episode of self-play with self.mcts, see
+        SelfPlay.executeEpisode.
 
         Returns:
-            trainExamples: a list of examples of the form (canonicalBoard, currPlayer, pi, v)
+            trainExamples: a list of examples of the form (canonicalBoard, pi, v)
                            pi is the MCTS informed policy vector, v is +1 if
                            the player eventually won the game, else -1.
         """
-        trainExamples = []
-        board = self.game.getInitBoard()
-        self.curPlayer = 1
-        episodeStep = 0
-
-        while True:
-            episodeStep += 1
-            canonicalBoard = self.game.getCanonicalForm(board, self.curPlayer)
-            temp = int(episodeStep < self.args.tempThreshold)
+        return executeEpisode(self.game, self.mcts, self.args)
 
-            pi = self.mcts.getActionProb(canonicalBoard, temp=temp)
-            sym = self.game.getSymmetries(canonicalBoard, pi)
-            for b, p in sym:
-                trainExamples.append([b, self.curPlayer, p, None])
+    def selfPlay(self, iteration):
+        """
+        Plays the numEps self-play episodes of an iteration, in worker
+        processes if args.numSelfPlayWorkers > 1.
 
-            action = np.random.choice(len(pi), p=pi)
-            board, self.curPlayer = self.game.getNextState(board, self.curPlayer, action)
+        Returns:
+            iterationTrainExamples: the examples of all episodes, in episode order
+        """
+        iterationTrainExamples = deque([], maxlen=self.args.maxlenOfQueue)
 
-            r = self.game.getGameEnded(board, self.curPlayer)
+        if self.args.get('numSelfPlayWorkers', 1) > 1:
+            if self.selfPlayPool is None:
+                self.selfPlayPool = SelfPlayPool(self.game, self.nnet, self.args)
+            self.nnet.save_checkpoint(folder=self.args.checkpoint, filename='selfplay.weights.keras')
+            episodes = self.selfPlayPool.play(iteration, self.args.numEps, self.args.checkpoint, 'selfplay.weights.keras')
+            for examples in tqdm(episodes, total=self.args.numEps, desc="Self Play"):
+                iterationTrainExamples += examples
+        else:
+            for episode in tqdm(range(self.args.numEps), desc="Self Play"):
+                seedEpisode(self.args, iteration, episode)
+                self.mcts = MCTS(self.game, self.nnet, self.args)  # reset search tree
+                iterationTrainExamples += self.executeEpisode()
 
-            if r != 0:
-                return [(x[0], x[2], r * ((-1) ** (x[1] != self.curPlayer))) for x in trainExamples]
+        return iterationTrainExamples
 
     def learn(self):
         """
@@ -73,61 +78,50 @@ class Coach:
         iteration. After every iteration, it retrains neural network with
         examples in trainExamples (which has a maximum length of maxlenofQueue).
         It then pits the new neural network against the old one and accepts it
-        only if it wins >= updateThreshold fraction of games.
+        only if it wins >= updateThreshold fraction of games. With
+        args.pipelined the three steps overlap, see _learnPipelined.
         """
+        if not self.skipFirstSelfPlay and self.replayBuffer.segments():
+            # the replay buffer was not adopted by loadTrainExamples, so it is left over from an earlier run
+            if self.args.get('clearReplayBuffer'):
+                log.warning(f'Deleting the replay buffer of an earlier run in "{self.replayBuffer.folder}"')
+                self.replayBuffer.clear()
+            else:
+                log.warning(f'Moved the replay buffer of an earlier run to "{self.replayBuffer.archive()}"')
+        try:
+            if self.args.get('pipelined'):
+                self._learnPipelined()
+            else:
+                self._learn()
+        finally:
+            if self.selfPlayPool is not None:
+                self.selfPlayPool.close()
+                self.selfPlayPool = None
+
+    def _learn(self):
         for i in range(1, self.args.numIters + 1):
             log.info(f'Starting Iter #{i} ...')
             iterationTrainExamples = deque([], maxlen=self.args.maxlenOfQueue)
 
             # Execute episodes of self-play
             if not self.skipFirstSelfPlay or i > 1:
-                for _ in tqdm(range(self.args.numEps), desc="Self Play"):
-                    self.mcts = MCTS(self.game, self.nnet, self.args)  # reset search tree
-                    iterationTrainExamples += self.executeEpisode()
-
-                # Save the iteration examples to the history
-                self.trainExamplesHistory.append(iterationTrainExamples)
+                iterationTrainExamples = self.selfPlay(i)
 
             # Check if iterationTrainExamples is empty
             if not iterationTrainExamples:
                 log.error(f"No training examples collected in Iter #{i}!")
                 continue
 
-            if len(self.trainExamplesHistory) > self.args.numItersForTrainExamplesHistory:
-                log.warning(f"Removing the oldest entry in trainExamples. len(trainExamplesHistory) = {len(self.trainExamplesHistory)}")
-                self.trainExamplesHistory.pop(0)
-
-            # Backup history to a file
-            self.saveTrainExamples(i - 1)
-
-            # Shuffle examples before training
-            trainExamples = []
-            for e in self.trainExamplesHistory:
-                trainExamples.extend(e)
-            shuffle(trainExamples)
-
-            # Check if trainExamples is empty
-            if not trainExamples:
-                log.error(f"No training examples available for training in Iter #{i}!")
-                continue
+            # Save the iteration examples to the history on disk, dropping the oldest iteration if needed
+            self.replayBuffer.append(iterationTrainExamples)
 
             # Training new network, keeping a copy of the old one
             self.nnet.save_checkpoint(folder=self.args.checkpoint, filename='temp.weights.keras')
-            self.nnet.train(trainExamples)  # Train the model for every iteration
+            self.train()
 
             if i > 1:  # Skip arena evaluation for the first iteration
-                self.pnet.load_checkpoint(folder=self.args.checkpoint, filename='temp.weights.keras')
-                pmcts = MCTS(self.game, self.pnet, self.args)
-
-                nmcts = MCTS(self.game, self.nnet, self.args)
-
                 log.info('PITTING AGAINST PREVIOUS VERSION')
-                arena = Arena(lambda x: np.argmax(pmcts.getActionProb(x, temp=0)),
-                              lambda x: np.argmax(nmcts.getActionProb(x, temp=0)), self.game)
-                pwins, nwins, draws = arena.playGames(self.args.arenaCompare)
-
-                log.info('NEW/PREV WINS : %d / %d ; DRAWS : %d' % (nwins, pwins, draws))
-                if pwins + nwins == 0 or float(nwins) / (pwins + nwins) < self.args.updateThreshold:
+                if not self.pit(self.getArena()):
                     log.info('REJECTING NEW MODEL')
                     self.nnet.load_checkpoint(folder=self.args.checkpoint, filename='temp.weights.keras')
                 else:
@@ -139,30 +133,228 @@ class Coach:
                 self.nnet.save_checkpoint(folder=self.args.checkpoint, filename=self.getCheckpointFile(i))
                 self.nnet.save_checkpoint(folder=self.args.checkpoint, filename='best.weights.keras')
 
+    def _learnPipelined(self):
+        """
+        The iterations of _learn, overlapped (args.pipelined). The self-play
+        workers play the episodes of the next iteration with the best weights
+        while this process trains on the replay buffer, and every trained
+        network is gated in the background against best.weights.keras, in
+        arena worker processes. A network accepted by the gate becomes
+        best.weights.keras, which the workers load for the next episodes they
+        are given. The network keeps training from its own latest weights
+        whatever the gate decides.
+
+        While a gate is running, the newest trained network waits for the
+        next one; older waiting networks are dropped.
+        """
+        best = os.path.join(self.args.checkpoint, 'best.weights.keras')
+        if not os.path.isfile(best):
+            self.nnet.save_checkpoint(folder=self.args.checkpoint, filename='best.weights.keras')
+        if self.selfPlayPool is None:
+            self.selfPlayPool = SelfPlayPool(self.game, self.pnet, self.args)
+        self.loadBestNetwork()  # evaluates self-play with an inference server
+
+        gating = ThreadPoolExecutor(max_workers=1)
+        gate = None  # (iteration, Future of the pit) of the running gate
+        waiting = None  # iteration of the newest trained network waiting for the gate
+        newWeights = True  # best.weights.keras changed since the workers were last given episodes
+        start = time.time()
+        numGames = numUpdates = 0
+
+        def submit(i):
+            nonlocal newWeights
+            if i <= self.args.numIters and (not self.skipFirstSelfPlay or i > 1):
+                self.selfPlayPool.submit(i, self.args.numEps, self.args.checkpoint, 'best.weights.keras', newWeights)
+                newWeights = False
+
+        try:
+            submit(1)
+            for i in range(1, self.args.numIters + 1):
+                log.info(f'Starting Iter #{i} ...')
+                submit(i + 1)  # one iteration is always queued ahead, so the workers never wait for the trainer
+
+                if not self.skipFirstSelfPlay or i > 1:
+                    iterationTrainExamples = deque([], maxlen=self.args.maxlenOfQueue)
+                    for examples in tqdm(self.selfPlayPool.collect(i, self.args.numEps), total=self.args.numEps, desc="Self Play"):
+                        iterationTrainExamples += examples
+                    numGames += self.args.numEps
+                    if iterationTrainExamples:
+                        self.replayBuffer.append(iterationTrainExamples)
+                    else:
+                        log.error(f"No training examples collected in Iter #{i}!")
+                if not self.replayBuffer.segments():
+                    continue
+
+                self.train()
+                self.nnet.save_checkpoint(folder=self.args.checkpoint, filename=self.getCandidateFile(i))
+                if waiting is not None:
+                    os.remove(os.path.join(self.args.checkpoint, self.getCandidateFile(waiting)))
+                waiting = i
+
+                if gate is not None and gate[1].done():
+                    accepted = self.finishGate(*gate)
+                    numUpdates += accepted
+                    newWeights = newWeights or accepted
+                    gate = None
+                if gate is None:
+                    gate = (waiting, gating.submit(self.gate, waiting))
+                    waiting = None
+
+                hours = (time.time() - start) / 3600
+                log.info(f'Pipeline: {numGames / hours:.1f} games/hour, {numUpdates / hours:.2f} model updates/hour')
+
+            # gate the last trained networks
+            while gate is not None:
+                numUpdates += self.finishGate(*gate)
+                gate = None
+                if waiting is not None:
+                    gate = (waiting, gating.submit(self.gate, waiting))
+                    waiting = None
+        finally:
+            gating.shutdown(wait=False)
+
+    def gate(self, iteration):
+        """
+        Pits the network trained in iteration, saved by _learnPipelined,
+        against best.weights.keras in arena worker processes.
+
+        Returns:
+            accept: True if the trained network is better
+        """
+        log.info(f'PITTING NETWORK OF ITER #{iteration} AGAINST BEST')
+        nnetClass = self.nnet.__class__
+        arena = ParallelArena(partial(MCTSPlayer.fromCheckpoint, self.game, nnetClass, self.args.checkpoint, 'best.weights.keras', self.args),
+                              partial(MCTSPlayer.fromCheckpoint, self.game, nnetClass, self.args.checkpoint, self.getCandidateFile(iteration), self.args),
+                              self.game, max(1, self.args.get('numArenaWorkers', 1)))
+        return self.pit(arena)
+
+    def finishGate(self, iteration, future):
+        """
+        Waits for the gate of the network of iteration and makes it the best
+        network if it was accepted.
+
+        Returns:
+            accept: True if the network was accepted
+        """
+        candidate = os.path.join(self.args.checkpoint, self.getCandidateFile(iteration))
+        if not future.result():
+            log.info(f'REJECTING NETWORK OF ITER #{iteration}')
+            os.remove(candidate)
+            return False
+
+        log.info(f'ACCEPTING NETWORK OF ITER #{iteration}')
+        shutil.copyfile(candidate, os.path.join(self.args.checkpoint, self.getCheckpointFile(iteration)))
+        # replaced at once, as the workers may be loading it
+        os.replace(candidate, os.path.join(self.args.checkpoint, 'best.weights.keras'))
+        self.loadBestNetwork()
+        return True
+
+    def loadBestNetwork(self):
+        """
+        Loads best.weights.keras into a new pnet and hands it to the self-play
+        workers. The previous pnet is left untouched, as the inference server
+        may be evaluating a batch with it.
+        """
+        pnet = self.nnet.__class__(self.game)
+        pnet.load_checkpoint(folder=self.args.checkpoint, filename='best.weights.keras')
+        self.pnet = pnet
+        self.selfPlayPool.setNetwork(pnet)
+
+    def pit(self, arena):
+        """
+        Plays args.arenaCompare games in arena, previous network (player1)
+        against new network (player2), stopping early if args.arenaEarlyStop
+        or args.arenaSPRT allow it.
+
+        Returns:
+            accept: True if the new network won at least updateThreshold of
+                    the decided games, or if the SPRT accepted it
+        """
+        updateThreshold = self.args.updateThreshold if self.args.get('arenaEarlyStop') else None
+        sprt = SPRT(self.args.sprtElo0, self.args.sprtElo1, self.args.sprtAlpha, self.args.sprtBeta) if self.args.get('arenaSPRT') else None
+        pwins, nwins, draws = arena.playGames(self.args.arenaCompare, updateThreshold=updateThreshold, sprt=sprt)
+
+        log.info('NEW/PREV WINS : %d / %d ; DRAWS : %d' % (nwins, pwins, draws))
+        accept = pwins + nwins > 0 and float(nwins) / (pwins + nwins) >= self.args.updateThreshold
+        if sprt is not None:
+            # the SPRT decides if it reached a decision, else the updateThreshold does
+            elo, margin = sprt.elo(nwins, draws, pwins)
+            log.info('SPRT AFTER %d / %d GAMES : ELO %+.0f +/- %.0f ; LLR %.2f (%.2f, %.2f)' % (
+                arena.gamesPlayed, self.args.arenaCompare, elo, margin, sprt.llr(nwins, draws, pwins), sprt.lower, sprt.upper))
+            decision = sprt.decide(nwins, draws, pwins)
+            if decision is not None:
+                accept = decision
+        return accept
+
+    def train(self):
+        """
+        Trains self.nnet on the examples in the replay buffer. With
+        args.streamTraining the network reads them from the buffer itself,
+        batch by batch; otherwise they are shuffled and passed as a list.
+        """
+        augment = bool(self.args.get('lazySymmetries'))  # examples hold no symmetries, draw them while training
+        if self.args.get('streamTraining'):
+            self.nnet.train_from_replay_buffer(self.replayBuffer, augment=augment)
+            return
+
+        # Shuffle examples before training
+        trainExamples = self.replayBuffer.examples()
+        shuffle(trainExamples)
+        if augment:
+            self.nnet.train(trainExamples, augment=True)
+        else:
+            self.nnet.train(trainExamples)  # Train the model for every iteration
+
+    def getArena(self):
+        """
+        Returns the Arena pitting the previous network, saved as
+        temp.weights.keras, (player1) against the new one (player2). With
+        args.numArenaWorkers > 1 the games are played in worker processes,
+        which load both networks from checkpoint files.
+        """
+        numWorkers = self.args.get('numArenaWorkers', 1)
+        if numWorkers > 1:
+            self.nnet.save_checkpoint(folder=self.args.checkpoint, filename='arena.weights.keras')
+            nnetClass = self.nnet.__class__
+            return ParallelArena(partial(MCTSPlayer.fromCheckpoint, self.game, nnetClass, self.args.checkpoint, 'temp.weights.keras', self.args),
+                                 partial(MCTSPlayer.fromCheckpoint, self.game, nnetClass, self.args.checkpoint, 'arena.weights.keras', self.args),
+                                 self.game, numWorkers)
+
+        self.pnet.load_checkpoint(folder=self.args.checkpoint, filename='temp.weights.keras')
+        return Arena(MCTSPlayer(self.game, self.pnet, self.args),
+                     MCTSPlayer(self.game, self.nnet, self.args), self.game)
+
     def getCheckpointFile(self, iteration):
         return f'checkpoint_{iteration}.weights.keras'
 
-    def saveTrainExamples(self, iteration):
-        folder = self.args.checkpoint
-        if not os.path.exists(folder):
-            os.makedirs(folder)
-        filename = os.path.join(folder, self.getCheckpointFile(iteration) + ".examples")
-        with open(filename, "wb+") as f:
-            Pickler(f).dump(self.trainExamplesHistory)
+    def getCandidateFile(self, iteration):
+        return f'candidate_{iteration}.weights.keras'
 
     def loadTrainExamples(self):
-        modelFile = os.path.join(self.args.load_folder_file[0], self.args.load_folder_file[1])
-        examplesFile = modelFile + ".examples"
-        if not os.path.isfile(examplesFile):
-            log.warning(f'File "{examplesFile}" with trainExamples not found!"')
+        """
+        Continues with the replay buffer in the folder of args.load_folder_file.
+        A trainExamples file pickled by earlier versions next to the model is
+        converted to a replay buffer first.
+        """
+        folder = self.args.load_folder_file[0]
+        replayBuffer = ReplayBuffer(os.path.join(folder, 'replay'), self.args.numItersForTrainExamplesHistory)
+
+        examplesFile = os.path.join(folder, self.args.load_folder_file[1]) + ".examples"
+        if not replayBuffer.segments() and os.path.isfile(examplesFile):
+            log.info("Pickled trainExamples found. Converting them to a replay buffer...")
+            with open(examplesFile, "rb") as f:
+                for examples in Unpickler(f).load():
+                    if examples:
+                        replayBuffer.append(examples)
+
+        if not replayBuffer.segments():
+            log.warning(f'No trainExamples found in "{replayBuffer.folder}"!')
             r = input("Continue? [y|n]")
             if r != "y":
                 sys.exit()
         else:
-            log.info("File with trainExamples found. Loading it...")
-            with open(examplesFile, "rb") as f:
-                self.trainExamplesHistory = Unpickler(f).load()
-            log.info('Loading done!')
+            self.replayBuffer = replayBuffer
+            log.info(f'Loaded {len(replayBuffer)} trainExamples!')
 
             # Examples based on the model were already collected (loaded)
             self.skipFirstSelfPlay = True
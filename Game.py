@@ -59,11 +59,39 @@ class Game():
         """
         pass
 
-    def getGameEnded(self, board, player):
+    def getCandidateMoves(self, board, player):
+        """
+        Input:
+            board: current board
+            player: current player
+
+        Returns:
+            candidateMoves: a binary vector of length self.getActionSize(), 1
+                            for the valid moves worth searching. MCTS only
+                            expands these. The default is all valid moves.
+        """
+        return self.getValidMoves(board, player)
+
+    def getForcedMove(self, board, player):
+        """
+        Input:
+            board: current board
+            player: current player
+
+        Returns:
+            action: a move that player has to play, found without search
+                    (e.g. a winning move or the only defence), or None if
+                    the game knows none. The default is None.
+        """
+        return None
+
+    def getGameEnded(self, board, player, action=None):
         """
         Input:
             board: current board
             player: current player (1 or -1)
+            action: (optional) last action played on board. Games can use it
+                    to only look at what that action changed.
 
         Returns:
             r: 0 if game has not ended. 1 if player won, -1 if player lost,
@@ -110,4 +138,21 @@ class Game():
             boardString: a quick conversion of board to a string format.
                          Required by MCTS for hashing.
         """
-        pass
\ No newline at end of file
+        pass
+
+    def getSymmetricRepresentation(self, board):
+        """
+        Input:
+            board: current board
+
+        Returns:
+            boardString: a string that is the same for board and all its
+                         symmetrical forms. Used by MCTS to share statistics
+                         between symmetrical boards.
+            perm: an array mapping actions of the symmetrical form boardString
+                  was built from to actions of board: action j there is
+                  action perm[j] on board. None if that form is board itself.
+
+        The default treats every board as having no symmetries.
+        """
+        return self.stringRepresentation(board), None
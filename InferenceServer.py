@@ -0,0 +1,124 @@
+import logging
+import multiprocessing as mp
+import threading
+import time
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from NeuralNet import Evaluator
+
+log = logging.getLogger(__name__)
+
+
+class InferenceClient(Evaluator):
+    """
+    An Evaluator that forwards its predictions to an InferenceServer through a
+    pipe, so it can be used by MCTS in another process. The network and its
+    weights live in the server process; training and checkpoints are handled
+    there.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def predict(self, board):
+        pis, vs = self.predict_batch(np.asarray(board)[np.newaxis])
+        return pis[0], vs[0]
+
+    def predict_batch(self, boards):
+        self.conn.send(np.asarray(boards))
+        return self.conn.recv()
+
+
+class InferenceServer():
+    """
+    This class serves the predictions of one NeuralNet to InferenceClients in
+    other processes. A background thread gathers the boards sent by all
+    clients into one batch, until it holds maxBatchSize boards or timeout
+    seconds have passed since the first request, evaluates them with a single
+    nnet.predict_batch call and sends every client its rows back.
+    """
+
+    def __init__(self, nnet, maxBatchSize=256, timeout=0.002):
+        self.nnet = nnet
+        self.lock = threading.Lock()  # held while nnet evaluates a batch, so setNetwork never swaps it mid-batch
+        self.maxBatchSize = maxBatchSize
+        self.timeout = timeout
+        self.conns = []  # server ends of the client pipes
+        self.thread = None
+        self.running = False
+        self.numBatches = 0
+        self.numBoards = 0
+
+    def client(self):
+        """
+        Returns a new InferenceClient connected to this server. Clients must be
+        created before start() and can be passed to child processes.
+        """
+        serverConn, clientConn = mp.Pipe()
+        self.conns.append(serverConn)
+        return InferenceClient(clientConn)
+
+    def setNetwork(self, nnet):
+        """
+        Serves the predictions of nnet from the next batch on. nnet must be a
+        network of its own, fully loaded: the one being replaced may still be
+        evaluating a batch in the server thread.
+        """
+        with self.lock:
+            self.nnet = nnet
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.serve, name='InferenceServer', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.numBatches:
+            log.info(f'Inference server: {self.numBoards} boards in {self.numBatches} batches, '
+                     f'{self.numBoards / self.numBatches:.1f} boards/batch')
+
+    def serve(self):
+        while self.running and self.conns:
+            ready = wait(self.conns, timeout=0.1)
+            if not ready:
+                continue
+
+            # a client waits for its answer, so it sends at most one request per batch
+            requests = []  # (conn, boards)
+            count = 0
+            deadline = time.time() + self.timeout
+            while ready:
+                for conn in ready:
+                    try:
+                        boards = conn.recv()
+                    except EOFError:
+                        self.conns.remove(conn)  # the client process has exited
+                        continue
+                    requests.append((conn, boards))
+                    count += len(boards)
+
+                remaining = deadline - time.time()
+                if count >= self.maxBatchSize or remaining <= 0:
+                    break
+                waiting = [c for c in self.conns if all(c is not conn for conn, _ in requests)]
+                ready = wait(waiting, timeout=remaining) if waiting else []
+
+            if not requests:
+                continue
+
+            with self.lock:
+                pis, vs = self.nnet.predict_batch(np.concatenate([boards for _, boards in requests]))
+            self.numBatches += 1
+            self.numBoards += count
+
+            start = 0
+            for conn, boards in requests:
+                end = start + len(boards)
+                conn.send((pis[start:end], vs[start:end]))
+                start = end
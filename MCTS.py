@@ -1,44 +1,161 @@
 import logging
-import math
+import time
 
 import numpy as np
 
 EPS = 1e-8
+VIRTUAL_LOSS = 1  # number of losses added to an edge while its batched leaf waits for the network
 
 log = logging.getLogger(__name__)
 
 
+class Node():
+    """
+    This class holds the search statistics of one board. The edge statistics
+    are NumPy arrays over the valid actions of the board only, so that the
+    action with the highest upper confidence bound is a single argmax.
+    """
+    __slots__ = ('E', 'actions', 'P', 'N', 'W', 'Q', 'n', 'children')
+
+    def __init__(self, E):
+        self.E = E  # game.getGameEnded for the board
+        self.actions = None  # valid actions of the board, None until the node is expanded
+        self.P = None  # initial policy over actions (returned by neural net)
+        self.N = None  # #times each edge was visited
+        self.W = None  # total value of each edge
+        self.Q = None  # mean value of each edge (as defined in the paper)
+        self.n = 0  # #times the board was visited
+        self.children = {}  # Node reached by each edge index that has been taken
+
+    def expand(self, valids, pi):
+        """
+        Stores the network policy pi with invalid moves masked and starts the
+        edge statistics of the valid actions.
+        """
+        self.actions = np.flatnonzero(valids)
+        self.P = np.asarray(pi, dtype=np.float64)[self.actions]  # masking invalid moves
+        sum_P = np.sum(self.P)
+        if sum_P > 0:
+            self.P /= sum_P  # renormalize
+        else:
+            # if all valid moves were masked make all valid moves equally probable
+
+            # NB! All valid moves may be masked if either your NNet architecture is insufficient or you've get overfitting or something else.
+            # If you have got dozens or hundreds of these messages you should pay attention to your NNet and/or training process.
+            log.error("All valid moves were masked, doing a workaround.")
+            self.P = np.full(len(self.actions), 1. / len(self.actions))
+
+        self.N = np.zeros(len(self.actions), dtype=np.int32)
+        self.W = np.zeros(len(self.actions))
+        self.Q = np.zeros(len(self.actions))
+        self.n = 0
+
+    def select(self, cpuct):
+        """
+        Returns the index (into actions) of the edge with the highest upper
+        confidence bound. Unvisited edges count with Q = 0.
+        """
+        u = self.Q + cpuct * self.P * np.sqrt(self.n + EPS) / (1 + self.N)
+        return int(np.argmax(u))
+
+    def update(self, i, v):
+        """
+        Adds the value v, seen from the player to move at this board, to edge i.
+        """
+        self.N[i] += 1
+        self.W[i] += v
+        self.Q[i] = self.W[i] / self.N[i]
+        self.n += 1
+
+    def addVirtualLoss(self, i):
+        self.N[i] += VIRTUAL_LOSS
+        self.W[i] -= VIRTUAL_LOSS
+        self.Q[i] = self.W[i] / self.N[i]
+        self.n += VIRTUAL_LOSS
+
+    def removeVirtualLoss(self, i):
+        self.N[i] -= VIRTUAL_LOSS
+        self.W[i] += VIRTUAL_LOSS
+        self.Q[i] = self.W[i] / self.N[i] if self.N[i] else 0
+        self.n -= VIRTUAL_LOSS
+
+
 class MCTS():
     """
     This class handles the MCTS tree.
+
+    With args.symmetricTT, boards are keyed by game.getSymmetricRepresentation
+    so that all symmetries of a board share one Node. The statistics of a
+    Node are then kept in the orientation of that common key, and the
+    actions are mapped to and from the orientation of the board searched.
     """
 
     def __init__(self, game, nnet, args):
         self.game = game
         self.nnet = nnet
         self.args = args
-        self.Qsa = {}  # stores Q values for s,a (as defined in the paper)
-        self.Nsa = {}  # stores #times edge s,a was visited
-        self.Ns = {}  # stores #times board s was visited
-        self.Ps = {}  # stores initial policy (returned by neural net)
-
-        self.Es = {}  # stores game.getGameEnded ended for board s
-        self.Vs = {}  # stores game.getValidMoves for board s
+        self.symmetric = bool(args.get('symmetricTT'))
+        self.nodes = {}  # stores the Node of board s
+        self.root = None  # s of the board the last search started from
+        self.rootBoard = None  # that board, needed to follow advanceRoot
 
-    def getActionProb(self, canonicalBoard, temp=1):
+    def getActionProb(self, canonicalBoard, temp=1, numSims=None, deadline=None):
         """
-        This function performs numMCTSSims simulations of MCTS starting from
-        canonicalBoard.
+        This function performs numSims (by default args.numMCTSSims)
+        simulations of MCTS starting from canonicalBoard. If a deadline (a
+        time.time() value) is given, the search stops early once it is passed,
+        but not before a simulation went through the root. As the first
+        simulation on a new root only expands it, one more simulation is run
+        if needed so that the returned policy is never all zeros. If args.mctsBatchSize is larger than 1,
+        the simulations are run in rounds of that many leaves by searchBatch.
+
+        Statistics already gathered for canonicalBoard are kept, so after
+        advanceRoot the search continues from the subtree of the move played.
+
+        With args.threatShortcut, a move forced by game.getForcedMove is
+        returned at once, without any simulation.
 
         Returns:
             probs: a policy vector where the probability of the ith action is
-                   proportional to Nsa[(s,a)]**(1./temp)
+                   proportional to N(s,a)**(1./temp)
         """
-        for i in range(self.args.numMCTSSims):
-            self.search(canonicalBoard)
+        if self.args.get('threatShortcut'):
+            forced = self.game.getForcedMove(canonicalBoard, 1)
+            if forced is not None:
+                self.root, _ = self.getKey(canonicalBoard)
+                self.rootBoard = canonicalBoard
+                probs = [0] * self.game.getActionSize()
+                probs[forced] = 1
+                return probs
+
+        numSims = max(self.args.numMCTSSims if numSims is None else numSims, 1)
+        batchSize = self.args.get('mctsBatchSize', 1)
+        root, _ = self.getNode(canonicalBoard)
+        if batchSize > 1:
+            done = 0
+            if root.E == 0 and root.actions is None:
+                # an unexpanded root would be the leaf of every path of the first batch
+                self.search(canonicalBoard)
+                done = 1
+            while done < numSims:
+                if root.n > 0 and deadline is not None and time.time() >= deadline:
+                    break
+                done += self.searchBatch(canonicalBoard, min(batchSize, numSims - done))
+        else:
+            for i in range(numSims):
+                if root.n > 0 and deadline is not None and time.time() >= deadline:
+                    break
+                self.search(canonicalBoard)
+        if root.E == 0 and root.n == 0:
+            self.search(canonicalBoard)  # the only simulation expanded the root, one more gives it a visit
 
-        s = self.game.stringRepresentation(canonicalBoard)
-        counts = [self.Nsa[(s, a)] if (s, a) in self.Nsa else 0 for a in range(self.game.getActionSize())]
+        s, perm = self.getKey(canonicalBoard)
+        self.root = s
+        self.rootBoard = canonicalBoard
+        node = self.nodes[s]
+        counts = np.zeros(self.game.getActionSize())
+        if node.actions is not None:
+            counts[node.actions if perm is None else perm[node.actions]] = node.N
 
         if temp == 0:
             bestAs = np.array(np.argwhere(counts == np.max(counts))).flatten()
@@ -52,7 +169,33 @@ class MCTS():
         probs = [x / counts_sum for x in counts]
         return probs
 
-    def search(self, canonicalBoard):
+    def advanceRoot(self, action):
+        """
+        Moves the root of the tree to the board reached by playing action from
+        the board of the last getActionProb call. It works for the moves of
+        both players, as the tree holds the boards of both. Only the subtree of
+        the new root is kept; the statistics of its siblings are discarded.
+
+        Does nothing if no search was run yet.
+        """
+        if self.rootBoard is None:
+            return
+
+        next_s, next_player = self.game.getNextState(self.rootBoard, 1, action)
+        self.rootBoard = self.game.getCanonicalForm(next_s, next_player)
+        self.root, _ = self.getKey(self.rootBoard)
+
+        # keep the nodes reachable from the new root
+        reachable = set()
+        stack = [self.nodes[self.root]] if self.root in self.nodes else []
+        while stack:
+            node = stack.pop()
+            if id(node) not in reachable:
+                reachable.add(id(node))
+                stack.extend(node.children.values())
+        self.nodes = {s: node for s, node in self.nodes.items() if id(node) in reachable}
+
+    def search(self, canonicalBoard, action=None, node=None, perm=None):
         """
         This function performs one iteration of MCTS. It is recursively called
         till a leaf node is found. The action chosen at each node is one that
@@ -61,76 +204,198 @@ class MCTS():
         Once a leaf node is found, the neural network is called to return an
         initial policy P and a value v for the state. This value is propagated
         up the search path. In case the leaf node is a terminal state, the
-        outcome is propagated up the search path. The values of Ns, Nsa, Qsa are
-        updated.
+        outcome is propagated up the search path. The values of n, N, W and Q
+        are updated.
 
         NOTE: the return values are the negative of the value of the current
         state. This is done since v is in [-1,1] and if v is the value of a
         state for the current player, then its value is -v for the other player.
 
+        The action that led to canonicalBoard is passed down the recursion so
+        that the terminal check only has to look at the last move, along with
+        the Node of canonicalBoard (and its perm, see getKey) when the parent
+        already has it.
+
         Returns:
             v: the negative of the value of the current canonicalBoard
         """
 
-        s = self.game.stringRepresentation(canonicalBoard)
-
-        if s not in self.Es:
-            self.Es[s] = self.game.getGameEnded(canonicalBoard, 1)
-        if self.Es[s] != 0:
+        if node is None:
+            node, perm = self.getNode(canonicalBoard, action)
+        if node.E != 0:
             # terminal node
-            return -self.Es[s]
+            return -node.E
 
-        if s not in self.Ps:
+        if node.actions is None:
             # leaf node
-            self.Ps[s], v = self.nnet.predict(canonicalBoard)
-            valids = self.game.getValidMoves(canonicalBoard, 1)
-            self.Ps[s] = self.Ps[s] * valids  # masking invalid moves
-            sum_Ps_s = np.sum(self.Ps[s])
-            if sum_Ps_s > 0:
-                self.Ps[s] /= sum_Ps_s  # renormalize
-            else:
-                # if all valid moves were masked make all valid moves equally probable
-
-                # NB! All valid moves may be masked if either your NNet architecture is insufficient or you've get overfitting or something else.
-                # If you have got dozens or hundreds of these messages you should pay attention to your NNet and/or training process.   
-                log.error("All valid moves were masked, doing a workaround.")
-                self.Ps[s] = self.Ps[s] + valids
-                self.Ps[s] /= np.sum(self.Ps[s])
-
-            self.Vs[s] = valids
-            self.Ns[s] = 0
-            return -v
-
-        valids = self.Vs[s]
-        cur_best = -float('inf')
-        best_act = -1
-
-        # pick the action with the highest upper confidence bound
-        for a in range(self.game.getActionSize()):
-            if valids[a]:
-                if (s, a) in self.Qsa:
-                    u = self.Qsa[(s, a)] + self.args.cpuct * self.Ps[s][a] * math.sqrt(self.Ns[s]) / (
-                            1 + self.Nsa[(s, a)])
-                else:
-                    u = self.args.cpuct * self.Ps[s][a] * math.sqrt(self.Ns[s] + EPS)  # Q = 0 ?
-
-                if u > cur_best:
-                    cur_best = u
-                    best_act = a
-
-        a = best_act
+            pi, v = self.nnet.predict(canonicalBoard)
+            self.expand(node, canonicalBoard, pi, perm)
+            return -float(v)
+
+        i = node.select(self.args.cpuct)
+        a = int(node.actions[i]) if perm is None else int(perm[node.actions[i]])
         next_s, next_player = self.game.getNextState(canonicalBoard, 1, a)
         next_s = self.game.getCanonicalForm(next_s, next_player)
 
-        v = self.search(next_s)
+        child, childPerm = self.getChild(node, i, next_s, a)
+        v = self.search(next_s, a, child, childPerm)
 
-        if (s, a) in self.Qsa:
-            self.Qsa[(s, a)] = (self.Nsa[(s, a)] * self.Qsa[(s, a)] + v) / (self.Nsa[(s, a)] + 1)
-            self.Nsa[(s, a)] += 1
+        node.update(i, v)
+        return -v
 
-        else:
-            self.Qsa[(s, a)] = v
-            self.Nsa[(s, a)] = 1
+    def searchBatch(self, canonicalBoard, batchSize):
+        """
+        This function performs batchSize iterations of MCTS from canonicalBoard
+        with a single call to the neural network.
+
+        Each iteration walks down the tree as in search, but leaves a virtual
+        loss on every edge it takes so that the following iterations spread
+        out over other leaves. The leaves found are evaluated together with
+        nnet.predict_batch, then every path is backed up and its virtual loss
+        removed. An iteration that ends on a leaf already waiting for the
+        network keeps its virtual losses until the end of the batch and is
+        retried, at most batchSize times in total, so the next walks avoid
+        that leaf.
+
+        Returns:
+            done: the number of iterations performed, batchSize unless too
+                  many walks ended on waiting leaves
+        """
+        pending = []  # (path, node, board, perm) of leaves waiting for the network
+        pendingNodes = set()
+        collided = []  # paths that ended on a waiting leaf
+        done = 0
+
+        while done < batchSize and len(collided) < batchSize:
+            board, action = canonicalBoard, None
+            node, perm = self.getNode(board)
+            path = []  # (node, i) edges taken from the root
+
+            while True:
+                if node.E != 0:
+                    # terminal node
+                    self.backup(path, -node.E)
+                    done += 1
+                    break
+
+                if node.actions is None:
+                    # leaf node
+                    if id(node) in pendingNodes:
+                        collided.append(path)
+                    else:
+                        pending.append((path, node, board, perm))
+                        pendingNodes.add(id(node))
+                        done += 1
+                    break
+
+                i = node.select(self.args.cpuct)
+                node.addVirtualLoss(i)
+                path.append((node, i))
+                action = int(node.actions[i]) if perm is None else int(perm[node.actions[i]])
+                board, next_player = self.game.getNextState(board, 1, action)
+                board = self.game.getCanonicalForm(board, next_player)
+                node, perm = self.getChild(node, i, board, action)
+
+        for path in collided:
+            for parent, i in path:
+                parent.removeVirtualLoss(i)
+
+        if pending:
+            pis, vs = self.nnet.predict_batch([board for _, _, board, _ in pending])
+            for (path, node, board, perm), pi, v in zip(pending, pis, vs):
+                self.expand(node, board, pi, perm)
+                self.backup(path, -float(v))
+        return done
+
+    def getKey(self, canonicalBoard):
+        """
+        Returns:
+            s: the key of canonicalBoard in nodes
+            perm: None, or with args.symmetricTT the array mapping the actions
+                  of the orientation of s to the actions of canonicalBoard
+        """
+        if self.symmetric:
+            return self.game.getSymmetricRepresentation(canonicalBoard)
+        return self.game.stringRepresentation(canonicalBoard), None
+
+    def getNode(self, canonicalBoard, action=None):
+        """
+        Returns the Node of canonicalBoard and its perm (see getKey), creating
+        the Node if the board has not been seen yet.
+        """
+        s, perm = self.getKey(canonicalBoard)
+        node = self.nodes.get(s)
+        if node is None:
+            node = self.nodes[s] = Node(self.game.getGameEnded(canonicalBoard, 1, action))
+        return node, perm
+
+    def getChild(self, node, i, canonicalBoard, action):
+        """
+        Returns the Node and perm of canonicalBoard, reached from node by its
+        edge i, and links the Node as that child. Without symmetries an
+        existing link saves computing the key of the board.
+        """
+        child = node.children.get(i)
+        if child is not None and not self.symmetric:
+            return child, None
+        child, perm = self.getNode(canonicalBoard, action)
+        node.children[i] = child
+        return child, perm
+
+    def expand(self, node, canonicalBoard, pi, perm=None):
+        """
+        Expands node with the network policy pi of canonicalBoard, mapped to
+        the orientation of the node if perm is given.
+        """
+        valids = self.game.getCandidateMoves(canonicalBoard, 1)
+        if perm is not None:
+            valids = valids[perm]
+            pi = np.asarray(pi)[perm]
+        node.expand(valids, pi)
+
+    def backup(self, path, v):
+        """
+        Propagates the value v of the last board of path up the path, removing
+        the virtual losses on the way. v is seen from the player who moved
+        into that board.
+        """
+        for node, i in reversed(path):
+            node.removeVirtualLoss(i)
+            node.update(i, v)
+            v = -v
+
+
+class MCTSPlayer():
+    """
+    An Arena player that plays the most visited action of its MCTS. The search
+    tree is kept between moves: the root follows the player's own moves and,
+    through notify, the opponent's, so each search starts from the statistics
+    gathered for the current board.
+    """
+
+    def __init__(self, game, nnet, args):
+        self.game = game
+        self.nnet = nnet
+        self.args = args
+        self.mcts = MCTS(game, nnet, args)
+
+    @classmethod
+    def fromCheckpoint(cls, game, nnetClass, folder, filename, args):
+        """
+        Builds a player whose network is a new nnetClass loaded from
+        folder/filename. Used to build players in other processes.
+        """
+        nnet = nnetClass(game)
+        nnet.load_checkpoint(folder=folder, filename=filename)
+        return cls(game, nnet, args)
+
+    def startGame(self):
+        self.mcts = MCTS(self.game, self.nnet, self.args)  # reset search tree
+
+    def __call__(self, canonicalBoard):
+        action = int(np.argmax(self.mcts.getActionProb(canonicalBoard, temp=0)))
+        self.mcts.advanceRoot(action)
+        return action
 
-        self.Ns[s] += 1
-        return -v
\ No newline at end of file
+    def notify(self, board, action):
+        self.mcts.advanceRoot(action)
@@ -1,9 +1,55 @@
-class NeuralNet():
+import numpy as np
+
+
+class Evaluator():
+    """
+    This class specifies the part of NeuralNet that searching needs: the
+    evaluation of canonical boards. MCTS, the Arena players and the inference
+    server only call these functions, so predict-only evaluators (a served or
+    exported model, a heuristic, a client of another process' network)
+    subclass this class rather than NeuralNet.
+    """
+
+    def __init__(self, game):
+        pass
+
+    def predict(self, board):
+        """
+        Input:
+            board: current board in its canonical form.
+
+        Returns:
+            pi: a policy vector for the current board- a numpy array of length
+                game.getActionSize
+            v: a float in [-1,1] that gives the value of the current board
+        """
+        pass
+
+    def predict_batch(self, boards):
+        """
+        Input:
+            boards: a list (or array) of boards in their canonical form.
+
+        Returns:
+            pis: an array of policy vectors, one row per board
+            vs: an array with the value of each board
+
+        The default evaluates the boards one by one with predict. Override it
+        when the network can evaluate several boards in one forward pass.
+        """
+        results = [self.predict(board) for board in boards]
+        pis = [pi for pi, _ in results]
+        vs = [float(np.ravel(v)[0]) for _, v in results]
+        return np.asarray(pis), np.asarray(vs)
+
+
+class NeuralNet(Evaluator):
     """
     This class specifies the base NeuralNet class. To define your own neural
     network, subclass this class and implement the functions below. The neural
     network does not consider the current player, and instead only deals with
-    the canonical form of the board.
+    the canonical form of the board. predict and predict_batch are those of
+    Evaluator.
 
     See othello/NNet.py for an example implementation.
     """
@@ -24,18 +70,6 @@ class NeuralNet():
         """
         pass
 
-    def predict(self, board):
-        """
-        Input:
-            board: current board in its canonical form.
-
-        Returns:
-            pi: a policy vector for the current board- a numpy array of length
-                game.getActionSize
-            v: a float in [-1,1] that gives the value of the current board
-        """
-        pass
-
     def save_checkpoint(self, folder, filename):
         """
         Saves the current neural network (with its parameters) in
@@ -0,0 +1,99 @@
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class ReplayBuffer():
+    """
+    This class stores the training examples of the latest maxSegments
+    iterations on disk. The examples of one iteration form a segment: a
+    folder with one .npy file per field, in fixed compact dtypes (int8
+    boards, float16 policies, float32 values). Segments are written once and
+    memory-mapped when read; the oldest one is evicted by deleting its folder.
+    """
+    BOARD_DTYPE = np.int8
+    PI_DTYPE = np.float16
+    V_DTYPE = np.float32
+
+    def __init__(self, folder, maxSegments):
+        self.folder = folder
+        self.maxSegments = maxSegments
+
+    def segments(self):
+        """
+        Returns the segment folders, oldest first.
+        """
+        if not os.path.isdir(self.folder):
+            return []
+        # a .tmp folder is a segment whose append did not complete
+        names = sorted(name for name in os.listdir(self.folder) if name.startswith('segment_') and not name.endswith('.tmp'))
+        return [os.path.join(self.folder, name) for name in names]
+
+    def append(self, examples):
+        """
+        Writes examples, a list of (board, pi, v), as a new segment and evicts
+        the oldest segments beyond maxSegments.
+        """
+        segments = self.segments()
+        index = int(os.path.basename(segments[-1])[len('segment_'):]) + 1 if segments else 0
+        path = os.path.join(self.folder, f'segment_{index:06d}')
+        tmpPath = path + '.tmp'
+        os.makedirs(tmpPath, exist_ok=True)
+
+        boards, pis, vs = list(zip(*examples))
+        np.save(os.path.join(tmpPath, 'boards.npy'), np.asarray(boards, dtype=self.BOARD_DTYPE))
+        np.save(os.path.join(tmpPath, 'pis.npy'), np.asarray(pis, dtype=self.PI_DTYPE))
+        np.save(os.path.join(tmpPath, 'vs.npy'), np.asarray(vs, dtype=self.V_DTYPE))
+        os.rename(tmpPath, path)  # a segment only appears once it is complete
+
+        segments.append(path)
+        while len(segments) > self.maxSegments:
+            log.warning(f"Removing the oldest segment of the replay buffer. len(segments) = {len(segments)}")
+            shutil.rmtree(segments.pop(0))
+
+    def archive(self):
+        """
+        Moves every segment to a new folder named after the current time,
+        next to the buffer folder, and returns its path. The buffer is then
+        empty.
+        """
+        path = base = f"{self.folder.rstrip(os.sep)}_{time.strftime('%Y%m%d-%H%M%S')}"
+        suffix = 1
+        while os.path.exists(path):
+            path = f'{base}_{suffix}'
+            suffix += 1
+        os.rename(self.folder, path)
+        return path
+
+    def clear(self):
+        """
+        Deletes every segment, including incomplete ones.
+        """
+        if os.path.isdir(self.folder):
+            shutil.rmtree(self.folder)
+
+    def load(self):
+        """
+        Returns a list with the (boards, pis, vs) arrays of every segment,
+        oldest first. The arrays are memory-mapped, read-only.
+        """
+        return [tuple(np.load(os.path.join(path, name), mmap_mode='r') for name in ('boards.npy', 'pis.npy', 'vs.npy'))
+                for path in self.segments()]
+
+    def examples(self):
+        """
+        Returns all stored examples as a list of (board, pi, v), where board
+        and pi are views into the memory-mapped segments.
+        """
+        examples = []
+        for boards, pis, vs in self.load():
+            examples.extend(zip(boards, pis, vs))
+        return examples
+
+    def __len__(self):
+        return sum(len(vs) for _, _, vs in self.load())
@@ -0,0 +1,241 @@
+import logging
+import multiprocessing as mp
+import queue
+import random
+import time
+import traceback
+
+import numpy as np
+
+from InferenceServer import InferenceServer
+from MCTS import MCTS
+
+log = logging.getLogger(__name__)
+
+
+def executeEpisode(game, mcts, args):
+    """
+    This function executes one episode of self-play, starting with player 1.
+    As the game is played, each turn is added as a training example to
+    trainExamples. The game is played till the game ends. After the game
+    ends, the outcome of the game is used to assign values to each example
+    in trainExamples.
+
+    It uses a temp=1 if episodeStep < tempThreshold, and thereafter
+    uses temp=0.
+
+    Every position is stored with all its symmetries from
+    game.getSymmetries, or only once if args.lazySymmetries is set; the
+    network then draws a random symmetry per sample while training.
+
+    Returns:
+        trainExamples: a list of examples of the form (canonicalBoard, pi, v)
+                       pi is the MCTS informed policy vector, v is +1 if
+                       the player eventually won the game, else -1.
+    """
+    trainExamples = []
+    board = game.getInitBoard()
+    curPlayer = 1
+    episodeStep = 0
+
+    while True:
+        episodeStep += 1
+        canonicalBoard = game.getCanonicalForm(board, curPlayer)
+        temp = int(episodeStep < args.tempThreshold)
+
+        pi = mcts.getActionProb(canonicalBoard, temp=temp)
+        if args.get('lazySymmetries'):
+            trainExamples.append([canonicalBoard, curPlayer, np.asarray(pi), None])
+        else:
+            sym = game.getSymmetries(canonicalBoard, pi)
+            for b, p in sym:
+                trainExamples.append([b, curPlayer, p, None])
+
+        action = np.random.choice(len(pi), p=pi)
+        mcts.advanceRoot(action)
+        board, curPlayer = game.getNextState(board, curPlayer, action)
+
+        r = game.getGameEnded(board, curPlayer, action)
+
+        if r != 0:
+            return [(x[0], x[2], r * ((-1) ** (x[1] != curPlayer))) for x in trainExamples]
+
+
+def seedEpisode(args, iteration, episode):
+    """
+    Seeds the random generators for one episode from args.seed, so that an
+    episode plays the same way whichever process runs it. Does nothing if
+    args.seed is not set.
+    """
+    if args.get('seed') is None:
+        return
+    seed = int(np.random.SeedSequence([args.seed, iteration, episode]).generate_state(1)[0])
+    np.random.seed(seed)
+    random.seed(seed)
+
+
+class SelfPlayError(RuntimeError):
+    """
+    Raised by SelfPlayPool when a worker process failed or exited.
+    """
+
+
+def _selfPlayWorker(workerId, game, nnetClass, client, args, tasks, results):
+    """
+    Entry point of a self-play process. Plays the episodes read from tasks and
+    puts their examples on results, until it reads None. The worker evaluates
+    boards with client if given, else with its own nnetClass network. If
+    anything fails, the worker puts a SelfPlayError with the traceback on
+    results and exits.
+    """
+    try:
+        nnet = client if client is not None else nnetClass(game)
+        weights = None
+
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            iteration, episode, folder, filename, version = task
+            if client is None and weights != version:
+                nnet.load_checkpoint(folder=folder, filename=filename)
+                weights = version
+
+            seedEpisode(args, iteration, episode)
+            start = time.time()
+            examples = executeEpisode(game, MCTS(game, nnet, args), args)
+            results.put((iteration, episode, workerId, examples, time.time() - start))
+    except Exception:
+        results.put(SelfPlayError(f'Self-play worker {workerId} failed:\n{traceback.format_exc()}'))
+
+
+class SelfPlayPool():
+    """
+    This class runs self-play episodes in args.numSelfPlayWorkers processes.
+    Every worker builds its own network, loads the weights from a checkpoint
+    and plays with its own MCTS. The processes are started on first use and
+    kept until close(); they reload the weights whenever a new checkpoint is
+    passed to play().
+
+    With args.useInferenceServer, the workers do not build networks. They send
+    their boards to an InferenceServer thread in this process, which batches
+    them over all workers and evaluates them with nnet itself.
+    """
+
+    def __init__(self, game, nnet, args):
+        self.game = game
+        self.nnetClass = nnet.__class__
+        self.args = args
+        self.numWorkers = args.numSelfPlayWorkers
+        self.workers = []
+        self.server = None
+        if args.get('useInferenceServer'):
+            self.server = InferenceServer(nnet, args.get('inferenceBatchSize', 256), args.get('inferenceTimeout', 0.002))
+        self.version = 0  # bumped for every new checkpoint passed to submit() so workers reload the weights
+        self.finished = {}  # (iteration, episode) -> examples read from results but not collected yet
+        self.stats = {}  # iteration -> {workerId: [episodes, examples, seconds]} of the results read so far
+
+        # spawn, as TensorFlow is not safe to use in forked processes
+        ctx = mp.get_context('spawn')
+        self.ctx = ctx
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+
+    def start(self):
+        for workerId in range(self.numWorkers):
+            client = self.server.client() if self.server is not None else None
+            worker = self.ctx.Process(target=_selfPlayWorker,
+                                      args=(workerId, self.game, self.nnetClass, client, self.args, self.tasks, self.results),
+                                      daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        if self.server is not None:
+            self.server.start()
+
+    def setNetwork(self, nnet):
+        """
+        Makes the inference server, if any, evaluate the boards of the workers
+        with nnet, a fully loaded network of its own.
+        """
+        if self.server is not None:
+            self.server.setNetwork(nnet)
+
+    def play(self, iteration, numEps, folder, filename):
+        """
+        Plays numEps episodes with the weights saved in folder/filename (or
+        with the server's network, when an inference server is used).
+
+        Yields the examples of each episode in episode order, as soon as the
+        episode and all episodes before it are done. With args.seed set, the
+        result does not depend on the number of workers.
+        """
+        self.submit(iteration, numEps, folder, filename)
+        yield from self.collect(iteration, numEps)
+
+    def submit(self, iteration, numEps, folder, filename, newWeights=True):
+        """
+        Queues numEps episodes of iteration without waiting for them, so that
+        the workers keep playing while this process does something else. Their
+        examples are read with collect(iteration, numEps). The workers reload
+        folder/filename first if newWeights is set.
+        """
+        if not self.workers:
+            self.start()
+        if newWeights:
+            self.version += 1
+        for episode in range(numEps):
+            self.tasks.put((iteration, episode, folder, filename, self.version))
+
+    def collect(self, iteration, numEps):
+        """
+        Yields the examples of the numEps episodes of iteration, queued with
+        submit, in episode order. Results of other iterations read meanwhile
+        are kept for their own collect call.
+        """
+        nextEpisode = 0
+        while nextEpisode < numEps:
+            if (iteration, nextEpisode) in self.finished:
+                yield self.finished.pop((iteration, nextEpisode))
+                nextEpisode += 1
+                continue
+
+            episodeIteration, episode, workerId, examples, elapsed = self.getResult()
+            self.finished[(episodeIteration, episode)] = examples
+            workerStats = self.stats.setdefault(episodeIteration, {}).setdefault(workerId, [0, 0, 0.])
+            workerStats[0] += 1
+            workerStats[1] += len(examples)
+            workerStats[2] += elapsed
+
+        for workerId, (episodes, examples, seconds) in sorted(self.stats.pop(iteration, {}).items()):
+            log.info(f'Self-play worker {workerId}: {episodes / seconds:.3f} episodes/sec, {examples / seconds:.1f} examples/sec')
+
+    def getResult(self):
+        """
+        Returns the next result put by a worker. Raises SelfPlayError, after
+        terminating the workers, if a worker reported a failure or a worker
+        process exited, instead of waiting forever.
+        """
+        while True:
+            try:
+                result = self.results.get(timeout=1.0)
+            except queue.Empty:
+                dead = [worker for worker in self.workers if not worker.is_alive()]
+                if not dead:
+                    continue
+                result = SelfPlayError(f'Self-play worker process {dead[0].pid} exited with code {dead[0].exitcode}')
+            if isinstance(result, SelfPlayError):
+                for worker in self.workers:
+                    worker.terminate()
+                    worker.join()
+                self.workers = []
+                raise result
+            return result
+
+    def close(self):
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        if self.server is not None:
+            self.server.stop()
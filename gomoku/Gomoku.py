@@ -3,6 +3,11 @@ import sys
 sys.path.append('..')  # Add parent directory to the system path for imports
 from Game import Game  # Import the Game base class
 from .GomokuLogic import Board  # Import the Board class specific to Gomoku
+from .GomokuArrayLogic import ArrayBoard  # Import the vectorized int8 board
+from .GomokuBitLogic import BitBoard, BitState  # Import the bitboard
+from .GomokuZobrist import Zobrist  # Import the Zobrist hashing of boards
+from .GomokuCandidates import Candidates  # Import the proximity-restricted candidate moves
+from .GomokuThreats import Threats  # Import the tactical threat solver
 import numpy as np  # Import NumPy for numerical operations
 
 class GomokuGame(Game):
@@ -13,6 +18,13 @@ class GomokuGame(Game):
         +1: "O"   # Player +1's piece
     }
 
+    # Board classes implementing the game rules, selected with the backend argument
+    backends = {
+        'list': Board,        # Reference implementation with nested Python loops
+        'array': ArrayBoard,  # Vectorized implementation on int8 NumPy arrays
+        'bit': BitBoard,      # Bitboards: boards are immutable BitStates of one int per color
+    }
+
     @staticmethod
     def getSquarePiece(piece):
         """
@@ -22,20 +34,47 @@ class GomokuGame(Game):
         """
         return GomokuGame.square_content[piece]
 
-    def __init__(self, n=20):
+    def __init__(self, n=20, backend='array', zobrist=False, candidateRadius=None, threatDepth=None):
         """
         Initialize the game with board size n x n.
         :param n: Size of the board (default is 20)
+        :param backend: Name of the board implementation in GomokuGame.backends (default is 'array', whose boards
+                        are int8 arrays; 'list' gives the int64 arrays of earlier versions)
+        :param zobrist: Make boards carry a Zobrist hash, updated in O(1) per move and used as their string representation
+        :param candidateRadius: Restrict getCandidateMoves, and so MCTS, to the empty squares within this distance
+                                of a stone; boards carry their candidates, updated per move (default is no restriction)
+        :param threatDepth: Make getForcedMove find wins, forced blocks and VCF sequences of up to this many fours
+                            (default is no threat detection)
         """
+        if backend == 'bit' and (zobrist or candidateRadius is not None):
+            # Both annotate board arrays; a BitState is its own key already
+            raise ValueError("zobrist and candidateRadius are not supported by the 'bit' backend")
         self.n = n
+        self.Board = self.backends[backend]
+        self.zobrist = Zobrist(n) if zobrist else None
+        self.candidates = Candidates(n, candidateRadius) if candidateRadius is not None else None
+        self.threats = Threats(n, threatDepth) if threatDepth is not None else None
+
+        # Flat cell indices of the 8 symmetries of the board, in the order of getSymmetries:
+        # symmetry t of a board is board.ravel()[self.symmetryPerms[t]]
+        cells = np.arange(n * n).reshape(n, n)
+        self.symmetryPerms = np.array([(np.fliplr(np.rot90(cells, i)) if j else np.rot90(cells, i)).ravel()
+                                       for i in range(1, 5) for j in [True, False]])
 
     def getInitBoard(self):
         """
         Return the initial board state.
         :return: Initial board as a NumPy array
         """
-        b = Board(self.n)  # Create a Board instance with size n
-        return np.array(b.pieces)  # Return the board pieces as a NumPy array
+        b = self.Board(self.n)  # Create a Board instance with size n
+        if isinstance(b.pieces, BitState):
+            return b.pieces
+        board = np.array(b.pieces)  # Return the board pieces as a NumPy array
+        if self.candidates:
+            board = self.candidates.wrap(board, np.zeros((self.n, self.n), dtype=bool))  # No stone, no candidate
+        if self.zobrist:
+            board = self.zobrist.wrap(board, (0, 0))  # The empty board hashes to 0
+        return board
 
     def getBoardSize(self):
         """
@@ -59,11 +98,19 @@ class GomokuGame(Game):
         :param action: Action to apply (position on the board)
         :return: Tuple (new board state, next player)
         """
-        b = Board(self.n)  # Create a new Board instance
-        b.pieces = np.copy(board)  # Copy the current board state
-        move = (int(action / self.n), action % self.n)  # Convert action to board coordinates
+        # Copy the current board state, the move is applied to the copy in place (a BitState is replaced instead)
+        action = int(action)  # A NumPy integer would make the bitboard shifts overflow
+        b = self.Board(self.n, board if isinstance(board, BitState) else np.copy(board))
+        move = divmod(action, self.n)  # Convert action to board coordinates
         b.execute_move(move, player)  # Execute the move
-        return (b.pieces, -player)  # Return the new board state and the next player
+        pieces = b.pieces
+        if self.candidates:
+            candidates = self.candidates.move(self.candidates.mask(board), pieces, action)  # Update the window around the new stone
+            pieces = self.candidates.wrap(pieces, candidates)
+        if self.zobrist:
+            hashes = self.zobrist.move(self.zobrist.hashes(board), action, player)  # Update the hash with the new stone
+            pieces = self.zobrist.wrap(pieces, hashes)
+        return (pieces, -player)  # Return the new board state and the next player
 
     def getValidMoves(self, board, player):
         """
@@ -72,28 +119,50 @@ class GomokuGame(Game):
         :param player: Current player (-1 or +1)
         :return: Binary vector of valid moves
         """
-        valids = [0] * self.getActionSize()  # Initialize the valid moves list with zeros
-        b = Board(self.n)  # Create a new Board instance
-        b.pieces = np.copy(board)  # Copy the current board state
-        legalMoves = b.get_legal_moves(player)  # Get the legal moves for the player
-        for x, y in legalMoves:  # Mark the valid moves
-            valids[self.n * x + y] = 1
-        return np.array(valids)  # Return the valid moves as a NumPy array
+        b = self.Board(self.n, board)  # Read-only, so the board is not copied
+        return np.asarray(b.get_legal_moves_mask(player))  # Return the valid moves as a NumPy array
 
-    def getGameEnded(self, board, player):
+    def getCandidateMoves(self, board, player):
+        """
+        Get the moves worth searching: with candidateRadius, the empty squares near a stone, else all valid moves.
+        :param board: Current board state
+        :param player: Current player (-1 or +1)
+        :return: Binary vector of candidate moves
+        """
+        if self.candidates:
+            return self.candidates.moves(board)
+        return self.getValidMoves(board, player)
+
+    def getForcedMove(self, board, player):
+        """
+        Get the move player has to play, if threat detection is enabled: a winning move, else the block of the
+        opponent's only winning move, else the first move of a victory by continuous fours.
+        :param board: Current board state
+        :param player: Current player (-1 or +1)
+        :return: Action, or None if the position is not forced
+        """
+        if self.threats:
+            return self.threats.forced_move(board, player)
+        return None
+
+    def getGameEnded(self, board, player, action=None):
         """
         Check if the game has ended.
         :param board: Current board state
         :param player: Current player (-1 or +1)
+        :param action: Last action played on the board, if known. Only the lines through it are checked then.
         :return: 0 if not ended, 1 if player 1 won, -1 if player 1 lost
         """
-        b = Board(self.n)  # Create a new Board instance
-        b.pieces = np.copy(board)  # Copy the current board state
-        if b.is_win(player):  # Check if the current player has won
+        b = self.Board(self.n, board)  # Read-only, so the board is not copied
+        if action is not None:
+            move = divmod(int(action), self.n)  # Convert action to board coordinates
+            if b.is_win_at(move):  # Only the last move can have completed a five
+                return 1 if b[move[0]][move[1]] == player else -1
+        elif b.is_win(player):  # Check if the current player has won
             return 1
-        if b.is_win(-player):  # Check if the opponent has won
+        elif b.is_win(-player):  # Check if the opponent has won
             return -1
-        if not b.has_legal_moves(player) and not b.has_legal_moves(-player):  # Check for a draw
+        if not b.has_legal_moves(player):  # Check for a draw: the empty squares are the same for both players
             return 1e-4  # Indicate a draw with a very small positive value to distinguish from no end
         return 0  # Game is not ended
 
@@ -104,7 +173,13 @@ class GomokuGame(Game):
         :param player: Current player (-1 or +1)
         :return: Canonical board state
         """
-        return player * board
+        canonical = player * board
+        if self.candidates:
+            canonical = self.candidates.wrap(canonical, self.candidates.mask(board))  # Colors do not change the candidates
+        if self.zobrist:
+            h, hNeg = self.zobrist.hashes(board)
+            canonical = self.zobrist.wrap(canonical, (h, hNeg) if player == 1 else (hNeg, h))  # Negating swaps the hashes
+        return canonical
 
     def getSymmetries(self, board, pi):
         """
@@ -131,9 +206,25 @@ class GomokuGame(Game):
         """
         Get a string representation of the board.
         :param board: Current board state
-        :return: String representation of the board
+        :return: String representation of the board, its 64-bit Zobrist hash if enabled, or its pair of bitboards
+        """
+        if self.zobrist:
+            return self.zobrist.hashes(board)[0]
+        if isinstance(board, BitState):
+            return board.key()
+        return board.tobytes()  # tostring() is deprecated
+
+    def getSymmetricRepresentation(self, board):
+        """
+        Get a string representation shared by the board and its 7 symmetrical forms.
+        :param board: Current board state
+        :return: Tuple (bytes of the lexicographically smallest symmetrical form,
+                 flat cell indices mapping actions of that form to actions of board)
         """
-        return board.tostring()
+        forms = np.asarray(board).ravel()[self.symmetryPerms]  # All 8 symmetrical forms, flattened
+        keys = [form.tobytes() for form in forms]
+        t = min(range(len(keys)), key=keys.__getitem__)  # Pick the smallest one
+        return keys[t], self.symmetryPerms[t]
 
     def stringRepresentationReadable(self, board):
         """
@@ -141,7 +232,7 @@ class GomokuGame(Game):
         :param board: Current board state
         :return: Human-readable string representation of the board
         """
-        board_s = "".join(self.square_content[square] for row in board for square in row)  # Convert board to string
+        board_s = "".join(self.square_content[square] for row in np.asarray(board) for square in row)  # Convert board to string
         return board_s
 
     def getScore(self, board, player):
@@ -151,8 +242,7 @@ class GomokuGame(Game):
         :param player: Player to get the score for (-1 or +1)
         :return: Score of the player
         """
-        b = Board(self.n)  # Create a new Board instance
-        b.pieces = np.copy(board)  # Copy the current board state
+        b = self.Board(self.n, board)  # Read-only, so the board is not copied
         return b.countDiff(player)  # Get the score for the player
 
     @staticmethod
@@ -161,6 +251,7 @@ class GomokuGame(Game):
         Display the board in a human-readable format.
         :param board: Current board state
         """
+        board = np.asarray(board)
         n = board.shape[0]  # Get the size of the board
         print("   ", end="")
         for y in range(n):  # Print column numbers
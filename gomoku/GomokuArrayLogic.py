@@ -0,0 +1,120 @@
+"""
+Array backed board class for Gomoku.
+Board data:
+  1=white, -1=black, 0=empty
+
+Same rules and results as GomokuLogic.Board, but the pieces are kept in an
+int8 NumPy array and every scan over the board is a vectorized operation.
+
+The boards of GomokuGame are therefore int8 with this backend, where the
+'list' backend gives int64 arrays. The values are the same, but the bytes
+are not: stringRepresentation keys differ from those of int64 boards, and
+training examples hold int8 boards. Examples pickled from int64 boards
+still load (the replay buffer stores boards as int8 anyway); use
+backend='list' to get int64 boards.
+"""
+import numpy as np
+
+from .GomokuLogic import Board
+
+
+class ArrayBoard(Board):
+
+    # Directions for five in a row, as (dx, dy) offsets
+    __directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
+
+    def __init__(self, n, pieces=None):
+        """
+        Initialize the board with the given size n.
+        :param n: Size of the board (n x n)
+        :param pieces: Existing board array to wrap (not copied), or None for an empty board
+        """
+        if pieces is None:
+            pieces = np.zeros((n, n), dtype=np.int8)
+        super().__init__(n, pieces)
+
+    def get_legal_moves(self, color):
+        """
+        Get all the legal moves for the given color.
+        :param color: Color of the player (1 for white, -1 for black)
+        :return: List of all legal moves as (x, y) tuples, in the same order as Board.get_legal_moves
+        """
+        return [(int(x), int(y)) for y, x in np.argwhere(self.pieces.T == 0)]
+
+    def get_legal_moves_mask(self, color):
+        """
+        Get the legal moves for the given color as a flat binary vector.
+        :param color: Color of the player (1 for white, -1 for black)
+        :return: int8 array of length n*n, 1 for legal moves and 0 otherwise
+        """
+        return (self.pieces.ravel() == 0).astype(np.int8)
+
+    def has_legal_moves(self, color):
+        """
+        Check if there are any legal moves for the given color.
+        :param color: Color of the player (1 for white, -1 for black)
+        :return: True if there are legal moves, False otherwise
+        """
+        return not self.pieces.all()
+
+    def execute_move(self, move, color):
+        """
+        Perform the given move on the board, in place.
+        :param move: (x, y) tuple representing the move
+        :param color: Color of the piece to play (1 for white, -1 for black)
+        """
+        self.pieces[move] = color
+
+    def countDiff(self, color):
+        """
+        Count the difference between the pieces of the given color and the opponent's.
+        :param color: Color of the player (1 for white, -1 for black)
+        :return: Number of pieces of color minus number of pieces of -color
+        """
+        return int(np.count_nonzero(self.pieces == color) - np.count_nonzero(self.pieces == -color))
+
+    def is_win(self, color):
+        """
+        Check if the given color has won the game.
+        Each direction is checked by AND-ing five shifted views of the
+        color mask, so a True cell marks the start of five in a row.
+        :param color: Color of the player (1 for white, -1 for black)
+        :return: True if the player has won, False otherwise
+        """
+        if self.n < 5:
+            return False
+        mask = self.pieces == color
+        for dx, dy in self.__directions:
+            len_x = self.n - 4 * abs(dx)
+            len_y = self.n - 4 * abs(dy)
+            y0 = 4 if dy < 0 else 0
+            run = mask[:len_x, y0:y0 + len_y]
+            for k in range(1, 5):
+                x, y = k * dx, y0 + k * dy
+                run = run & mask[x:x + len_x, y:y + len_y]
+            if run.any():
+                return True
+        return False
+
+    def _count_direction(self, origin, direction, color):
+        """
+        Count the consecutive pieces of a color next to the origin in one direction.
+        :param origin: (x, y) tuple representing the starting square (not counted)
+        :param direction: (dx, dy) tuple representing the direction of movement
+        :param color: Color of the pieces to count (1 for white, -1 for black)
+        :return: Number of consecutive pieces of that color, at most four
+        """
+        x, y = origin
+        dx, dy = direction
+        pieces = self.pieces
+        count = 0
+
+        for _ in range(4):
+            x += dx
+            y += dy
+            if 0 <= x < self.n and 0 <= y < self.n and pieces[x, y] == color:
+                count += 1
+            else:
+                break
+
+        return count
@@ -0,0 +1,216 @@
+"""
+Bitboard class for Gomoku.
+Board data:
+  1=white, -1=black, 0=empty
+
+Same rules and results as GomokuLogic.Board, but the board is a BitState:
+one Python int per color, with the square (x, y) at bit x * (n + 1) + y.
+The extra column of each row stays empty, so that shifting a row or an
+anti-diagonal past the edge of the board never reaches a stone. A move is
+one OR, five in a row is found with a few shift-and-ANDs per direction and
+the pair of ints is the key of the state.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from .GomokuLogic import Board
+
+
+class BitState():
+    """
+    Immutable board state of the bitboard backend. It converts to the usual
+    n x n int8 array wherever an array is needed (np.asarray, the neural
+    network, training examples), and player * state is the state seen by
+    player, as for arrays.
+    """
+    __slots__ = ('n', 'white', 'black')
+
+    def __init__(self, n, white=0, black=0):
+        self.n = n
+        self.white = white  # bits of the squares holding 1
+        self.black = black  # bits of the squares holding -1
+
+    @classmethod
+    def from_array(cls, n, pieces):
+        """
+        :param n: Size of the board (n x n)
+        :param pieces: n x n board array (or nested lists)
+        :return: BitState of pieces
+        """
+        pieces = np.asarray(pieces)
+        return cls(n, cls.to_bits(pieces == 1), cls.to_bits(pieces == -1))
+
+    @staticmethod
+    def to_bits(mask):
+        """
+        :param mask: n x n bool array
+        :return: Bits of the True squares
+        """
+        padded = np.zeros((mask.shape[0], mask.shape[1] + 1), dtype=bool)  # add the empty column
+        padded[:, :-1] = mask
+        return int.from_bytes(np.packbits(padded.ravel(), bitorder='little').tobytes(), 'little')
+
+    def to_mask(self, bits):
+        """
+        :param bits: Bits of squares
+        :return: n x n uint8 array, 1 for the squares in bits
+        """
+        size = self.n * (self.n + 1)
+        raw = np.frombuffer(bits.to_bytes((size + 7) // 8, 'little'), dtype=np.uint8)
+        return np.unpackbits(raw, bitorder='little')[:size].reshape(self.n, self.n + 1)[:, :-1]
+
+    def __array__(self, dtype=None, copy=None):
+        board = self.to_mask(self.white).astype(np.int8) - self.to_mask(self.black).astype(np.int8)
+        return board if dtype is None else board.astype(dtype)
+
+    @property
+    def shape(self):
+        return (self.n, self.n)
+
+    def key(self):
+        return (self.white, self.black)
+
+    def __mul__(self, player):
+        if player == 1:
+            return self
+        if player == -1:
+            return BitState(self.n, self.black, self.white)  # swap the colors
+        return np.asarray(self) * player
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return self * -1
+
+
+@lru_cache(maxsize=None)
+def all_squares(n):
+    """
+    :return: Bits of all the squares of an n x n board
+    """
+    return BitState.to_bits(np.ones((n, n), dtype=bool))
+
+
+class BitBoard(Board):
+
+    def __init__(self, n, pieces=None):
+        """
+        Initialize the board with the given size n.
+        :param n: Size of the board (n x n)
+        :param pieces: BitState to wrap (immutable, so never copied), a board array to convert,
+                       or None for an empty board
+        """
+        if pieces is None:
+            pieces = BitState(n)
+        elif not isinstance(pieces, BitState):
+            pieces = BitState.from_array(n, pieces)
+        super().__init__(n, pieces)
+        self.stride = n + 1
+        # Bit shift of one step in each direction of GomokuLogic.Board: (1, 0), (0, 1), (1, 1), (1, -1)
+        self.shifts = [self.stride, 1, self.stride + 1, self.stride - 1]
+        self.squares = all_squares(n)
+
+    def _bits(self, color):
+        return self.pieces.white if color == 1 else self.pieces.black
+
+    def _bit(self, move):
+        x, y = move
+        return 1 << (int(x) * self.stride + int(y))  # Python ints, NumPy integers would overflow past bit 63
+
+    def color_at(self, move):
+        """
+        :param move: (x, y) tuple of a square
+        :return: Color of the stone on the square, 0 if empty
+        """
+        bit = self._bit(move)
+        return 1 if self.pieces.white & bit else -1 if self.pieces.black & bit else 0
+
+    def __getitem__(self, index):
+        """
+        Allow the use of the board with [][] indexer syntax.
+        :param index: Index of the board
+        :return: Board row at the given index
+        """
+        return [self.color_at((index, y)) for y in range(self.n)]
+
+    def get_legal_moves(self, color):
+        """
+        Get all the legal moves for the given color.
+        :param color: Color of the player (1 for white, -1 for black)
+        :return: List of all legal moves as (x, y) tuples, in the same order as Board.get_legal_moves
+        """
+        empty = self.get_legal_moves_mask(color).reshape(self.n, self.n)
+        return [(int(x), int(y)) for y, x in np.argwhere(empty.T)]
+
+    def get_legal_moves_mask(self, color):
+        """
+        Get the legal moves for the given color as a flat binary vector.
+        :param color: Color of the player (1 for white, -1 for black)
+        :return: int8 array of length n*n, 1 for legal moves and 0 otherwise
+        """
+        empty = self.squares & ~(self.pieces.white | self.pieces.black)
+        return self.pieces.to_mask(empty).astype(np.int8).ravel()
+
+    def has_legal_moves(self, color):
+        """
+        Check if there are any legal moves for the given color.
+        :param color: Color of the player (1 for white, -1 for black)
+        :return: True if there are legal moves, False otherwise
+        """
+        return self.squares & ~(self.pieces.white | self.pieces.black) != 0
+
+    def execute_move(self, move, color):
+        """
+        Perform the given move, replacing the state of the board by a new one.
+        :param move: (x, y) tuple representing the move
+        :param color: Color of the piece to play (1 for white, -1 for black)
+        """
+        bit = self._bit(move)
+        if color == 1:
+            self.pieces = BitState(self.n, self.pieces.white | bit, self.pieces.black)
+        else:
+            self.pieces = BitState(self.n, self.pieces.white, self.pieces.black | bit)
+
+    def countDiff(self, color):
+        """
+        Count the difference between the pieces of the given color and the opponent's.
+        :param color: Color of the player (1 for white, -1 for black)
+        :return: Number of pieces of color minus number of pieces of -color
+        """
+        return bin(self._bits(color)).count('1') - bin(self._bits(-color)).count('1')
+
+    def _five_starts(self, bits, shift):
+        """
+        :return: Bits of the squares starting five in a row of bits in the direction of shift
+        """
+        run = bits & (bits >> shift)  # 2 in a row
+        run &= run >> (2 * shift)  # 4 in a row
+        return run & (bits >> (4 * shift))  # 5 in a row
+
+    def is_win(self, color):
+        """
+        Check if the given color has won the game.
+        :param color: Color of the player (1 for white, -1 for black)
+        :return: True if the player has won, False otherwise
+        """
+        bits = self._bits(color)
+        return any(self._five_starts(bits, shift) for shift in self.shifts)
+
+    def is_win_at(self, move):
+        """
+        Check if the stone at the given square completes five in a row.
+        :param move: (x, y) tuple representing the square of the last move
+        :return: True if the stone on that square is part of five in a row, False otherwise
+        """
+        color = self.color_at(move)
+        if color == 0:
+            return False
+        bits = self._bits(color)
+        square = int(move[0]) * self.stride + int(move[1])
+        for shift in self.shifts:
+            # The fives through the square start on it or up to 4 steps before it
+            starts = sum(1 << (square - k * shift) for k in range(5) if square - k * shift >= 0)
+            if self._five_starts(bits, shift) & starts:
+                return True
+        return False
@@ -0,0 +1,105 @@
+"""
+Proximity-restricted candidate moves for Gomoku.
+
+The candidates of a board are the empty squares within radius (in both
+rows and columns) of a stone. Nearly all good moves are there, so searching
+only them cuts the branching factor of the middlegame by an order of
+magnitude. A board that remembers its candidates gets those of the next
+board by updating the (2 * radius + 1)^2 window around the new stone.
+"""
+import numpy as np
+
+from .GomokuZobrist import ZobristBoard
+
+
+class CandidateBoard(ZobristBoard):
+    """
+    A board array carrying the mask of its candidate moves, as well as the
+    Zobrist hashes of ZobristBoard.
+
+    As for the hashes, any new array derived from it has its candidates
+    unset; only Candidates.wrap sets them.
+    """
+
+    def __array_finalize__(self, obj):
+        super().__array_finalize__(obj)
+        self.candidates = None  # n x n bool array, True for the candidate moves
+
+
+class Candidates():
+    """
+    Candidate move computations for n x n boards.
+    """
+
+    def __init__(self, n, radius=2):
+        """
+        :param n: Size of the board (n x n)
+        :param radius: Largest distance of a candidate to a stone, in rows and in columns
+        """
+        self.n = n
+        self.radius = radius
+
+    def mask(self, board):
+        """
+        Get the candidates of a board, in O(1) if the board carries them.
+        :param board: Board state
+        :return: n x n bool array, True for the empty squares within radius of a stone
+        """
+        if isinstance(board, CandidateBoard) and board.candidates is not None:
+            return board.candidates
+        occupied = np.asarray(board) != 0
+        # Dilate the stones by radius along the rows, then along the columns
+        rows = occupied.copy()
+        for d in range(1, self.radius + 1):
+            rows[d:] |= occupied[:-d]
+            rows[:-d] |= occupied[d:]
+        near = rows.copy()
+        for d in range(1, self.radius + 1):
+            near[:, d:] |= rows[:, :-d]
+            near[:, :-d] |= rows[:, d:]
+        return near & ~occupied
+
+    def move(self, candidates, pieces, action):
+        """
+        Get the candidates after a stone is placed.
+        :param candidates: Candidates of the board before the move
+        :param pieces: Board after the move
+        :param action: Square of the move
+        :return: n x n bool array of the candidates of pieces
+        """
+        x, y = divmod(action, self.n)
+        x0, x1 = max(0, x - self.radius), min(self.n, x + self.radius + 1)
+        y0, y1 = max(0, y - self.radius), min(self.n, y + self.radius + 1)
+        candidates = candidates.copy()
+        candidates[x0:x1, y0:y1] = pieces[x0:x1, y0:y1] == 0  # Every empty square of the window is now near a stone
+        return candidates
+
+    def moves(self, board):
+        """
+        Get the candidate moves of a board as a flat binary vector. The empty
+        board has the center as its only candidate, and a board without any
+        candidate falls back to all its empty squares.
+        :param board: Board state
+        :return: int8 array of length n*n, 1 for candidate moves and 0 otherwise
+        """
+        candidates = self.mask(board)
+        if candidates.any():
+            return candidates.ravel().astype(np.int8)
+        flat = np.asarray(board).ravel()
+        if not flat.any():
+            moves = np.zeros(self.n * self.n, dtype=np.int8)
+            moves[(self.n // 2) * self.n + self.n // 2] = 1
+            return moves
+        return (flat == 0).astype(np.int8)
+
+    @staticmethod
+    def wrap(board, candidates):
+        """
+        View a board array as a CandidateBoard carrying the given candidates.
+        :param board: Board state
+        :param candidates: n x n bool array of its candidates
+        :return: CandidateBoard sharing the data of board
+        """
+        board = board.view(CandidateBoard)
+        board.candidates = candidates
+        return board
@@ -0,0 +1,175 @@
+"""
+Line-pattern heuristic for Gomoku, ported from computer_move in
+traditional_game_implementation/scripts1.js.
+
+A move is scored for each color as if that color played it. In each of the
+four directions, every 5-square window through the move that holds stones
+of one color only is a pattern of that color: the run of consecutive stones
+through the move (read up to one square past the window) and the number of
+empty ends of the run give its score in the table below, or, when the
+window holds more stones than the run (a split pattern like O-OO), the
+closed score of that many stones. Each direction keeps its best pattern,
+and the score of a color is the sum over the directions. The best move has
+the largest sum of the attack (own) and defense (opponent) scores, with
+ties going to the larger attack score.
+
+The JS loops over cells, directions and windows; here every empty square
+is scored at once with shifted views of a padded board.
+"""
+import sys
+
+import numpy as np
+
+sys.path.append('..')
+from NeuralNet import Evaluator
+
+# Score of a run of 1 to 5 stones with at most one (column 0) or two (column 1) empty ends
+PATTERN_SCORES = np.array([[0, 1], [2, 3], [4, 12], [10, 64], [256, 256]])
+
+
+class Heuristic():
+    """
+    Pattern scores of all the squares of n x n boards.
+    """
+
+    # Directions of the lines, as (dx, dy) offsets
+    directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
+    pad = 6  # Farthest square read from a move: one past a window of 5
+    off = 2  # Value of the squares around the board
+
+    def __init__(self, n):
+        """
+        :param n: Size of the board (n x n)
+        """
+        self.n = n
+
+    def shifted(self, padded, d, m):
+        """
+        :param padded: Board array padded by pad squares on each side
+        :param d: Direction (dx, dy)
+        :param m: Number of steps
+        :return: n x n view whose square (x, y) is the square (x, y) + m * d of the board
+        """
+        x, y = self.pad + m * d[0], self.pad + m * d[1]
+        return padded[x:x + self.n, y:y + self.n]
+
+    def color_scores(self, padded, color):
+        """
+        Score the moves of color on every square.
+        :param padded: Board array padded by pad squares of value off
+        :param color: Color of the player (1 or -1)
+        :return: n x n int array, the sum over the directions of the best pattern of color through each square
+        """
+        own = padded == color
+        empty = padded == 0
+        blocked = ~own & ~empty  # The opponent's stones and the squares off the board
+        scores = np.zeros((self.n, self.n), dtype=np.int64)
+        for d in self.directions:
+            # Runs of own stones next to each square, in the + and - directions, with whether they end on an empty square
+            runs, open_ends = [], []
+            for sign in (1, -1):
+                run = np.zeros((self.n, self.n), dtype=np.int64)
+                open_end = np.zeros((self.n, self.n), dtype=bool)
+                alive = np.ones((self.n, self.n), dtype=bool)
+                for t in range(1, 6):
+                    open_end |= alive & self.shifted(empty, d, sign * t)
+                    alive &= self.shifted(own, d, sign * t)
+                    run += alive
+                runs.append(run)
+                open_ends.append(open_end)
+            (plus, minus), (plus_open, minus_open) = runs, open_ends
+
+            best = np.zeros((self.n, self.n), dtype=np.int64)
+            for k in range(5):
+                # The window holds the squares -4 + k to k steps from the move, and the run is read up to one step past it
+                window = range(k - 4, k + 1)
+                own_count = sum(self.shifted(own, d, m).astype(np.int64) for m in window)
+                valid = (own_count > 0) & ~np.logical_or.reduce([self.shifted(blocked, d, m) for m in window])
+                total = own_count + 1  # With the move
+                plus_cap, minus_cap = k + 1, 5 - k
+                consecutive = np.minimum(plus, plus_cap) + np.minimum(minus, minus_cap) + 1
+                sides = (plus_open & (plus < plus_cap)).astype(np.int64) + (minus_open & (minus < minus_cap))
+                score = np.where(consecutive >= total,
+                                 PATTERN_SCORES[np.minimum(consecutive, 5) - 1, np.maximum(sides - 1, 0)],
+                                 PATTERN_SCORES[np.minimum(total, 5) - 1, 0])
+                best = np.maximum(best, np.where(valid, score, 0))
+            scores += best
+        return scores
+
+    def scores(self, board):
+        """
+        Score the moves of both players on every empty square.
+        :param board: Canonical board state (the player to move is 1)
+        :return: attack, defense: n x n int arrays, the scores of the moves for player 1 and for player -1,
+                 0 on the occupied squares
+        """
+        pieces = np.asarray(board)
+        padded = np.full((self.n + 2 * self.pad, self.n + 2 * self.pad), self.off, dtype=np.int8)
+        padded[self.pad:-self.pad, self.pad:-self.pad] = pieces
+        empty = pieces == 0
+        return self.color_scores(padded, 1) * empty, self.color_scores(padded, -1) * empty
+
+    def best_move(self, board):
+        """
+        :param board: Canonical board state (the player to move is 1)
+        :return: Action of the best scored empty square (the center of an empty board), as in the JS front end
+        """
+        pieces = np.asarray(board)
+        if not pieces.any():
+            return (self.n // 2) * self.n + self.n // 2
+        attack, defense = self.scores(pieces)
+        # Attack scores stay below 4 * 1024, so this orders by the sum, then the attack, then the first square
+        key = (attack + defense) * 4096 + attack
+        key[pieces != 0] = -1
+        return int(np.argmax(key))
+
+
+class HeuristicPlayer():
+    """
+    An Arena player that plays the best move of the pattern heuristic. It is
+    deterministic and needs no network, which makes it a fixed baseline for
+    new checkpoints.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.heuristic = Heuristic(game.n)
+
+    def __call__(self, canonicalBoard):
+        return self.heuristic.best_move(canonicalBoard)
+
+
+class HeuristicNet(Evaluator):
+    """
+    Evaluator of boards by the pattern heuristic, so MCTS can search with it
+    before any network is trained, or compare against it.
+
+    The policy is a softmax of sharpness * log(1 + score) over the empty
+    squares, that is proportional to (1 + score) ** sharpness, and the value
+    is tanh((best attack - best defense) / value_scale).
+    """
+
+    def __init__(self, game, sharpness=1.0, value_scale=256.0):
+        """
+        :param game: GomokuGame
+        :param sharpness: Exponent of the policy, higher concentrates it on the best scored squares
+        :param value_scale: Score difference giving a value of tanh(1)
+        """
+        self.game = game
+        self.heuristic = Heuristic(game.n)
+        self.sharpness = sharpness
+        self.value_scale = value_scale
+
+    def predict(self, board):
+        pieces = np.asarray(board)
+        empty = (pieces == 0).ravel()
+        attack, defense = self.heuristic.scores(pieces)
+        logits = self.sharpness * np.log1p((attack + defense).ravel())
+        pi = np.where(empty, np.exp(logits - logits[empty].max()) if empty.any() else 0, 0)
+        if pi.sum() > 0:
+            pi = pi / pi.sum()
+        v = np.tanh((attack.max() - defense.max()) / self.value_scale)
+        return pi, v
+
+    def load_checkpoint(self, folder, filename):
+        pass  # Nothing to load, so MCTSPlayer.fromCheckpoint can build it in arena workers
@@ -11,14 +11,17 @@ class Board:
     # List of all 4 possible directions on the board for checking win condition, represented as (x, y) offsets
     __directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
 
-    def __init__(self, n):
+    def __init__(self, n, pieces=None):
         """
         Initialize the board with the given size n.
         :param n: Size of the board (n x n)
+        :param pieces: Existing board state to wrap (not copied), or None for an empty board
         """
         self.n = n
-        # Create an empty board array
-        self.pieces = [[0] * self.n for _ in range(self.n)]
+        if pieces is None:
+            # Create an empty board array
+            pieces = [[0] * self.n for _ in range(self.n)]
+        self.pieces = pieces
 
     def __getitem__(self, index):
         """
@@ -42,6 +45,17 @@ class Board:
                     moves.append((x, y))
         return moves
 
+    def get_legal_moves_mask(self, color):
+        """
+        Get the legal moves for the given color as a flat binary vector.
+        :param color: Color of the player (1 for white, -1 for black)
+        :return: List of n*n ints, 1 for legal moves and 0 otherwise
+        """
+        mask = [0] * (self.n * self.n)
+        for x, y in self.get_legal_moves(color):
+            mask[self.n * x + y] = 1
+        return mask
+
     def has_legal_moves(self, color):
         """
         Check if there are any legal moves for the given color.
@@ -59,6 +73,21 @@ class Board:
         x, y = move
         self.pieces[x][y] = color
 
+    def countDiff(self, color):
+        """
+        Count the difference between the pieces of the given color and the opponent's.
+        :param color: Color of the player (1 for white, -1 for black)
+        :return: Number of pieces of color minus number of pieces of -color
+        """
+        count = 0
+        for y in range(self.n):
+            for x in range(self.n):
+                if self[x][y] == color:
+                    count += 1
+                if self[x][y] == -color:
+                    count -= 1
+        return count
+
     def is_win(self, color):
         """
         Check if the given color has won the game.
@@ -73,6 +102,47 @@ class Board:
                             return True
         return False
 
+    def is_win_at(self, move):
+        """
+        Check if the stone at the given square completes five in a row.
+        Only the four lines through the move are scanned, so this is the
+        cheap check to use right after the move has been played.
+        :param move: (x, y) tuple representing the square of the last move
+        :return: True if the stone on that square is part of five in a row, False otherwise
+        """
+        x, y = move
+        color = self[x][y]
+        if color == 0:
+            return False
+        for dx, dy in self.__directions:
+            count = 1 + self._count_direction(move, (dx, dy), color) + self._count_direction(move, (-dx, -dy), color)
+            if count >= 5:
+                return True
+        return False
+
+    def _count_direction(self, origin, direction, color):
+        """
+        Count the consecutive pieces of a color next to the origin in one direction.
+        At most four pieces are counted, which is enough to decide a win.
+        :param origin: (x, y) tuple representing the starting square (not counted)
+        :param direction: (dx, dy) tuple representing the direction of movement
+        :param color: Color of the pieces to count (1 for white, -1 for black)
+        :return: Number of consecutive pieces of that color
+        """
+        x, y = origin
+        dx, dy = direction
+        count = 0
+
+        for _ in range(4):
+            x += dx
+            y += dy
+            if 0 <= x < self.n and 0 <= y < self.n and self[x][y] == color:
+                count += 1
+            else:
+                break
+
+        return count
+
     def _check_direction(self, origin, direction, color):
         """
         Check if there are five consecutive pieces in a given direction.
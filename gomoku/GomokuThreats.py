@@ -0,0 +1,151 @@
+"""
+Tactical threat detection for Gomoku.
+
+Every five in a row lies in some 5-square window along one of the four
+directions, so threats are read from the windows of the board:
+ - a window holding 4 stones of a color and 1 empty square makes that
+   square a winning move for the color,
+ - a window holding 3 stones of a color and 2 empty squares makes those
+   squares "four" moves: after one of them the color threatens to win.
+The window counts are vectorized over the board with NumPy slices.
+
+On top of these, forced_move finds immediate wins, mandatory blocks and
+victories by continuous fours (VCF): sequences of fours, each answered by
+the only block, ending in a double threat.
+"""
+import numpy as np
+
+from .GomokuLogic import Board
+
+
+class Threats():
+    """
+    Threat detection and bounded VCF search for n x n boards.
+    """
+
+    # Directions of the windows, as (dx, dy) offsets
+    directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
+
+    def __init__(self, n, vcf_depth=8, max_nodes=2000):
+        """
+        :param n: Size of the board (n x n)
+        :param vcf_depth: Largest number of fours in a VCF sequence (0 only looks for wins and blocks)
+        :param max_nodes: Largest number of positions visited by one VCF search
+        """
+        self.n = n
+        self.vcf_depth = vcf_depth
+        self.max_nodes = max_nodes
+        # For every direction, the slices selecting square k of all windows, indexed by the first square of the window
+        self.windows = []
+        for dx, dy in self.directions:
+            r0, r1 = max(0, -4 * dx), n - max(0, 4 * dx)
+            c0, c1 = max(0, -4 * dy), n - max(0, 4 * dy)
+            self.windows.append([(slice(r0 + k * dx, r1 + k * dx), slice(c0 + k * dy, c1 + k * dy)) for k in range(5)])
+
+    def threat_squares(self, pieces, color, stones):
+        """
+        Get the empty squares of the windows holding exactly stones stones of color and no stone of -color.
+        :param pieces: n x n board array
+        :param color: Color of the player (1 or -1)
+        :param stones: 4 for winning moves, 3 for four moves
+        :return: n x n bool array
+        """
+        own = pieces == color
+        empty = pieces == 0
+        squares = np.zeros((self.n, self.n), dtype=bool)
+        for cells in self.windows:
+            own_count = sum(own[cell].astype(np.int8) for cell in cells)
+            empty_count = sum(empty[cell].astype(np.int8) for cell in cells)
+            hits = (own_count == stones) & (empty_count == 5 - stones)
+            if hits.any():
+                for cell in cells:
+                    squares[cell] |= hits & empty[cell]
+        return squares
+
+    @staticmethod
+    def pieces(board):
+        """
+        :param board: Board state, or a GomokuLogic.Board
+        :return: n x n board array
+        """
+        return np.asarray(board.pieces if isinstance(board, Board) else board)
+
+    def winning_moves(self, board, color):
+        """
+        Get the moves completing five in a row (or more) for color.
+        :param board: Board state, or a GomokuLogic.Board
+        :param color: Color of the player (1 or -1)
+        :return: Array of actions
+        """
+        return np.flatnonzero(self.threat_squares(self.pieces(board), color, 4))
+
+    def four_moves(self, board, color):
+        """
+        Get the moves after which color threatens to complete five.
+        :param board: Board state, or a GomokuLogic.Board
+        :param color: Color of the player (1 or -1)
+        :return: Array of actions
+        """
+        return np.flatnonzero(self.threat_squares(self.pieces(board), color, 3))
+
+    def vcf(self, board, color=1, depth=None):
+        """
+        Search a victory by continuous fours for color, who is to move.
+        :param board: Board state, or a GomokuLogic.Board
+        :param color: Color of the attacker (1 or -1)
+        :param depth: Largest number of fours (default is vcf_depth)
+        :return: List of the actions of the sequence, alternating attacker fours and forced blocks and ending with
+                 the attacker's win or double threat, or None if none was found within the bounds
+        """
+        pieces = np.array(self.pieces(board), dtype=np.int8)  # Moves are tried in place and undone
+        # Positions visited, counted per search so that concurrent searches sharing this instance keep their bound
+        nodes = [0]
+        return self._vcf(pieces, color, self.vcf_depth if depth is None else depth, nodes)
+
+    def _vcf(self, pieces, color, depth, nodes):
+        wins = np.flatnonzero(self.threat_squares(pieces, color, 4))
+        if len(wins):
+            return [int(wins[0])]
+        if depth <= 0:
+            return None
+
+        flat = pieces.ravel()  # A view, so the moves below show in pieces
+        for four in self.four_moves(pieces, color):
+            nodes[0] += 1
+            if nodes[0] > self.max_nodes:
+                return None
+            flat[four] = color
+            line = None
+            blocks = np.flatnonzero(self.threat_squares(pieces, color, 4))
+            # The four only forces the block if the defender cannot win first
+            if len(blocks) and not self.threat_squares(pieces, -color, 4).any():
+                if len(blocks) >= 2:
+                    line = [int(four), int(blocks[0])]  # Double threat: the other square wins next
+                else:
+                    flat[blocks[0]] = -color
+                    rest = self._vcf(pieces, color, depth - 1, nodes)
+                    flat[blocks[0]] = 0
+                    if rest is not None:
+                        line = [int(four), int(blocks[0])] + rest
+            flat[four] = 0
+            if line is not None:
+                return line
+        return None
+
+    def forced_move(self, board, color=1):
+        """
+        Get the move color, who is to move, has to play: a winning move, else the block of the opponent's only
+        winning move, else the first move of a VCF.
+        :param board: Board state, or a GomokuLogic.Board
+        :param color: Color of the player to move (1 or -1)
+        :return: Action, or None if the position is not forced
+        """
+        pieces = self.pieces(board)
+        wins = self.winning_moves(pieces, color)
+        if len(wins):
+            return int(wins[0])
+        blocks = self.winning_moves(pieces, -color)
+        if len(blocks):
+            return int(blocks[0])  # With more than one, the game is lost anyway
+        line = self.vcf(pieces, color) if self.vcf_depth > 0 else None
+        return line[0] if line else None
@@ -0,0 +1,79 @@
+"""
+Zobrist hashing for Gomoku boards.
+
+The hash of a board is the XOR of one random 64-bit key per occupied
+square and color. Placing a stone changes it by a single XOR, so a board
+that remembers its hash gets the hash of the next board in O(1).
+"""
+import random
+
+import numpy as np
+
+
+class ZobristBoard(np.ndarray):
+    """
+    A board array carrying the Zobrist hashes of itself and of its negation
+    (the same board with the colors swapped, as made by getCanonicalForm).
+
+    Any new array derived from it (arithmetic, slicing, copies...) has both
+    hashes unset, as they may no longer match; only Zobrist.wrap sets them.
+    """
+
+    def __array_finalize__(self, obj):
+        self.zobrist = None  # hash of the board
+        self.zobristNeg = None  # hash of -board
+
+
+class Zobrist():
+    """
+    Random keys and hash computations for n x n boards.
+    """
+
+    def __init__(self, n, seed=0):
+        """
+        :param n: Size of the board (n x n)
+        :param seed: Seed of the random keys, so that hashes are the same in every process
+        """
+        rng = random.Random(seed)
+        # keys[action][color] for color -1 and 1 (index 0 is unused: empty squares do not count)
+        self.keys = [[0, rng.getrandbits(64), rng.getrandbits(64)] for _ in range(n * n)]
+
+    def hashes(self, board):
+        """
+        Get the hashes of a board and of its negation, in O(1) if the board carries them.
+        :param board: Board state
+        :return: Tuple (hash of board, hash of -board)
+        """
+        if isinstance(board, ZobristBoard) and board.zobrist is not None:
+            return board.zobrist, board.zobristNeg
+        h = hNeg = 0
+        flat = np.asarray(board).ravel()
+        for action in np.flatnonzero(flat):
+            color = int(flat[action])
+            h ^= self.keys[action][color]
+            hNeg ^= self.keys[action][-color]
+        return h, hNeg
+
+    def move(self, hashes, action, color):
+        """
+        Get the hashes after a stone is placed on an empty square.
+        :param hashes: Tuple (hash of board, hash of -board) before the move
+        :param action: Square of the move
+        :param color: Color of the stone (1 or -1)
+        :return: Tuple (hash of board, hash of -board) after the move
+        """
+        h, hNeg = hashes
+        return h ^ self.keys[action][color], hNeg ^ self.keys[action][-color]
+
+    @staticmethod
+    def wrap(board, hashes):
+        """
+        View a board array as a ZobristBoard carrying the given hashes.
+        :param board: Board state, itself if it is already a ZobristBoard (such as a CandidateBoard)
+        :param hashes: Tuple (hash of board, hash of -board)
+        :return: ZobristBoard sharing the data of board
+        """
+        if not isinstance(board, ZobristBoard):
+            board = board.view(ZobristBoard)
+        board.zobrist, board.zobristNeg = hashes
+        return board
@@ -0,0 +1,62 @@
+import tensorflow as tf
+from tensorflow.keras.models import Model
+from tensorflow.keras.layers import Input, Reshape, Conv2D, BatchNormalization, Activation, Add, Flatten, Dense, GlobalAveragePooling2D
+from tensorflow.keras.optimizers import Adam
+
+class GomukuResNet:
+    """
+    Residual tower of args.num_res_blocks blocks of args.res_channels channels, with fully convolutional heads.
+
+    The policy head is a 1x1 convolution to one plane, and the value head averages a few 1x1 planes over the
+    board before a small dense layer, so the parameter count does not grow with the board area.
+    """
+
+    def __init__(self, game, args):
+        # game params
+        self.board_x, self.board_y = game.getBoardSize()
+        self.action_size = game.getActionSize()
+        self.args = args
+
+        # Check for GPU and configure strategy
+        gpus = tf.config.list_physical_devices('GPU')
+        if gpus:
+            strategy = tf.distribute.MirroredStrategy()
+            print(f"Using GPUs: {gpus}")
+        else:
+            strategy = tf.distribute.get_strategy()
+            print("Using CPU")
+
+        with strategy.scope():
+            # Neural Net
+            self.input_boards = Input(shape=(self.board_x, self.board_y))    # s: batch_size x board_x x board_y
+
+            x_image = Reshape((self.board_x, self.board_y, 1))(self.input_boards)    # batch_size x board_x x board_y x 1
+            h = self.conv_bn(x_image, args.res_channels, 3)                            # batch_size x board_x x board_y x res_channels
+            for _ in range(args.num_res_blocks):
+                h = self.residual_block(h, args.res_channels)                          # batch_size x board_x x board_y x res_channels
+
+            h_pi = self.conv_bn(h, 2, 1)                                               # batch_size x board_x x board_y x 2
+            self.pi = Activation('softmax', name='pi')(Flatten()(Conv2D(1, 1)(h_pi)))  # batch_size x self.action_size
+
+            h_v = GlobalAveragePooling2D()(self.conv_bn(h, args.value_channels, 1))   # batch_size x value_channels
+            h_v = Dense(args.value_hidden, activation='relu')(h_v)                     # batch_size x value_hidden
+            self.v = Dense(1, activation='tanh', name='v')(h_v)                        # batch_size x 1
+
+            self.model = Model(inputs=self.input_boards, outputs=[self.pi, self.v])
+            self.model.compile(loss=['categorical_crossentropy', 'mean_squared_error'], optimizer=Adam(args.lr))
+
+    @staticmethod
+    def conv_bn(x, channels, kernel_size, activation=True):
+        x = BatchNormalization(axis=3)(Conv2D(channels, kernel_size, padding='same', use_bias=False)(x))
+        return Activation('relu')(x) if activation else x
+
+    def residual_block(self, x, channels):
+        h = self.conv_bn(x, channels, 3)
+        h = self.conv_bn(h, channels, 3, activation=False)
+        return Activation('relu')(Add()([x, h]))
+
+    def save_weights(self, filepath):
+        self.model.save_weights(filepath)
+
+    def load_weights(self, filepath):
+        self.model.load_weights(filepath)
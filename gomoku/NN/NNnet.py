@@ -1,4 +1,5 @@
 import argparse
+import itertools
 import os
 import time
 import numpy as np
@@ -9,6 +10,7 @@ sys.path.append('../..')
 from utils import *
 from NeuralNet import NeuralNet
 from .GomukuNet import GomukuNNet as gomnet
+from .GomukuResNet import GomukuResNet
 from tensorflow.keras.optimizers import Adam
 
 # Suppress TensorFlow INFO and DEBUG messages
@@ -22,9 +24,29 @@ args = dotdict({
     'epochs': 10,          # Number of epochs
     'batch_size': 64,      # Batch size
     'cuda': True,         # Use CUDA (not applicable for TensorFlow, generally for PyTorch)
-    'num_channels': 512,   # Number of channels in convolutional layers
+    'architecture': 'conv',  # Network family: 'conv' (GomukuNNet) or 'resnet' (GomukuResNet)
+    'num_channels': 512,   # Number of channels in convolutional layers ('conv')
+    'num_res_blocks': 6,   # Number of residual blocks ('resnet')
+    'res_channels': 64,    # Number of channels of the residual tower ('resnet')
+    'value_channels': 32,  # Number of 1x1 planes pooled by the value head ('resnet')
+    'value_hidden': 128,   # Size of the dense layer of the value head ('resnet')
+    'eval_cache_mb': 256,  # Memory for the evaluation cache shared by all networks of the process (0 = no cache)
 })
 
+# Network classes selectable with args.architecture
+architectures = {
+    'conv': gomnet,
+    'resnet': GomukuResNet,
+}
+
+# Process-wide cache of (policy, value) predictions, keyed by (model version, board representation).
+# Created with the first NNetWrapper, so that its size can be derived from the action size.
+eval_cache = None
+EVAL_CACHE_ENTRY_OVERHEAD = 300  # Approximate bytes per entry besides the policy vector
+
+# Every NNetWrapper gets a new model version whenever its weights change, so older cache entries stop matching
+model_versions = itertools.count()
+
 class NNetWrapper(NeuralNet):
     def __init__(self, game):
         """
@@ -35,33 +57,52 @@ class NNetWrapper(NeuralNet):
         # Initialize the Gomoku neural network
         self.game = game
         self.args = args
-        self.nnet = gomnet(game, args)
+        self.nnet = architectures[args.architecture](game, args)
+        print(f"Network '{args.architecture}': {self.nnet.model.count_params()} parameters")
         self.board_x, self.board_y = game.getBoardSize()  # Board dimensions
         self.action_size = game.getActionSize()           # Size of the action space
 
-    def train(self, examples, use_tf_dataset=False):
+        global eval_cache
+        if eval_cache is None and args.eval_cache_mb:
+            eval_cache = LRUCache(int(args.eval_cache_mb * 2 ** 20 / (self.action_size * 4 + EVAL_CACHE_ENTRY_OVERHEAD)))
+        self.model_version = next(model_versions)
+
+    def _weights_changed(self):
+        """
+        Invalidate the cached predictions of this network after its weights changed.
+        """
+        if eval_cache is not None:
+            print("Evaluation cache: ", eval_cache)
+        self.model_version = next(model_versions)
+
+    def train(self, examples, use_tf_dataset=False, augment=False):
         """
         Train the neural network with provided examples.
 
         :param examples: List of training examples, each example is of form (board, pi, v)
         :param use_tf_dataset: Boolean flag to choose between using tf.data.Dataset or direct NumPy arrays.
+        :param augment: Apply a random rotation/reflection to each sample as it is batched (implies use_tf_dataset).
         """
+        self._weights_changed()
+
         # Unzip examples into separate arrays
         input_boards, target_pis, target_vs = list(zip(*examples))
         input_boards = np.asarray(input_boards)
         target_pis = np.asarray(target_pis)
         target_vs = np.asarray(target_vs)
 
-        if use_tf_dataset:
+        if use_tf_dataset or augment:
             # Use tf.data.Dataset for more complex and efficient data handling
             train_dataset = tf.data.Dataset.from_tensor_slices((input_boards, (target_pis, target_vs)))
             train_dataset = train_dataset.shuffle(buffer_size=len(input_boards))  # Shuffle the dataset
+            if augment:
+                train_dataset = train_dataset.map(self._random_symmetry, num_parallel_calls=tf.data.experimental.AUTOTUNE)
             train_dataset = train_dataset.batch(args.batch_size)                 # Batch the dataset
             train_dataset = train_dataset.prefetch(buffer_size=tf.data.experimental.AUTOTUNE)  # Prefetch for efficiency
             train_dataset = train_dataset.repeat()  # Ensure the dataset repeats indefinitely for training
 
             # Train the model using the dataset
-            history = self.nnet.model.fit(train_dataset, epochs=args.epochs, steps_per_epoch=len(input_boards) // args.batch_size)
+            history = self.nnet.model.fit(train_dataset, epochs=args.epochs, steps_per_epoch=max(1, len(input_boards) // args.batch_size))
         else:
             # Use direct NumPy arrays for training
             history = self.nnet.model.fit(x=input_boards, y=[target_pis, target_vs], batch_size=args.batch_size, epochs=args.epochs)
@@ -69,6 +110,83 @@ class NNetWrapper(NeuralNet):
         # Print training history
         print("Training history: ", history.history)
 
+    def train_from_replay_buffer(self, replay_buffer, augment=False):
+        """
+        Train the neural network on all examples of a ReplayBuffer, streaming them from its memory-mapped segments.
+
+        Only a shuffled index of the examples is held in memory. Batches are gathered from the segments and
+        converted to float32 in parallel tf.data map calls, and prefetched while the model trains, so peak
+        memory does not grow with the size of the history.
+
+        :param replay_buffer: ReplayBuffer holding the training examples.
+        :param augment: Apply a random rotation/reflection to each sample as it is batched.
+        """
+        self._weights_changed()
+
+        segments = replay_buffer.load()
+        offsets = np.cumsum([0] + [len(vs) for _, _, vs in segments])  # global index of the first example of each segment
+        total = int(offsets[-1])
+        steps = max(1, total // args.batch_size)
+
+        def index_batches():
+            # A new shuffle of all examples for every epoch
+            for _ in range(args.epochs):
+                perm = np.random.permutation(total).astype(np.int32)
+                for start in range(0, steps * args.batch_size, args.batch_size):
+                    yield perm[start:start + args.batch_size]
+
+        def gather(indices):
+            indices = np.sort(indices)  # read each segment front to back
+            seg = np.searchsorted(offsets, indices, side='right') - 1
+            boards, pis, vs = [], [], []
+            for i in np.unique(seg):
+                rows = indices[seg == i] - offsets[i]
+                seg_boards, seg_pis, seg_vs = segments[i]
+                boards.append(seg_boards[rows])
+                pis.append(seg_pis[rows])
+                vs.append(seg_vs[rows])
+            return (np.concatenate(boards).astype(np.float32), np.concatenate(pis).astype(np.float32),
+                    np.concatenate(vs).astype(np.float32))
+
+        def load_batch(indices):
+            boards, pis, vs = tf.numpy_function(gather, [indices], [tf.float32, tf.float32, tf.float32])
+            boards = tf.ensure_shape(boards, (None, self.board_x, self.board_y))
+            pis = tf.ensure_shape(pis, (None, self.action_size))
+            vs = tf.ensure_shape(vs, (None,))
+            return boards, (pis, vs)
+
+        train_dataset = tf.data.Dataset.from_generator(index_batches, output_signature=tf.TensorSpec((None,), tf.int32))
+        train_dataset = train_dataset.map(load_batch, num_parallel_calls=tf.data.experimental.AUTOTUNE, deterministic=False)
+        if augment:
+            train_dataset = train_dataset.unbatch()
+            train_dataset = train_dataset.map(self._random_symmetry, num_parallel_calls=tf.data.experimental.AUTOTUNE)
+            train_dataset = train_dataset.batch(args.batch_size)
+        train_dataset = train_dataset.prefetch(buffer_size=tf.data.experimental.AUTOTUNE)  # Prefetch for efficiency
+
+        history = self.nnet.model.fit(train_dataset, epochs=args.epochs, steps_per_epoch=steps)
+
+        # Print training history
+        print("Training history: ", history.history)
+
+    def _random_symmetry(self, board, targets):
+        """
+        Apply one of the 8 rotations/reflections of the board, drawn at random, to a board and its policy.
+
+        :param board: Tensor of shape (board_x, board_y).
+        :param targets: Tuple (pi, v) where pi is a tensor of length action_size.
+        :return: (board, (pi, v)) with the same transformation applied to board and pi.
+        """
+        pi, v = targets
+        k = tf.random.uniform([], 0, 4, dtype=tf.int32)
+        flip = tf.random.uniform([]) < 0.5
+
+        # Stack board and policy as two channels so they get the same transformation
+        planes = tf.stack([tf.cast(board, tf.float32), tf.reshape(tf.cast(pi, tf.float32), (self.board_x, self.board_y))], axis=-1)
+        planes = tf.image.rot90(planes, k)
+        planes = tf.cond(flip, lambda: tf.image.flip_left_right(planes), lambda: planes)
+
+        return planes[:, :, 0], (tf.reshape(planes[:, :, 1], (self.action_size,)), v)
+
     def predict(self, board):
         """
         Predict the policy and value for a given board state.
@@ -76,19 +194,61 @@ class NNetWrapper(NeuralNet):
         :param board: np array representing the board state.
         :return: tuple (policy, value) where policy is the action probabilities and value is the game outcome.
         """
+        if eval_cache is not None:
+            key = (self.model_version, self.game.stringRepresentation(board))
+            cached = eval_cache.get(key)
+            if cached is not None:
+                return cached
+
         # Timing the prediction (optional)
         start = time.time()
 
         # Prepare the input for the model
-        board = board[np.newaxis, :, :]
+        board = np.asarray(board)[np.newaxis, :, :]
 
         # Run the prediction
         pi, v = self.nnet.model.predict(board, verbose=False)
 
         # Optionally print the time taken for prediction
         # print('PREDICTION TIME TAKEN : {0:03f}'.format(time.time()-start))
-        
-        return pi[0], v[0]
+
+        if eval_cache is not None:
+            eval_cache.put(key, (pi[0], v[0][0]))
+        return pi[0], v[0][0]
+
+    def predict_batch(self, boards):
+        """
+        Predict the policies and values for several board states in one forward pass.
+
+        :param boards: list or np array of board states.
+        :return: tuple (policies, values) with one row of action probabilities and one value per board.
+        """
+        if eval_cache is None:
+            return self._predict_on_batch(np.asarray(boards))
+
+        # Only evaluate the boards missing from the cache
+        keys = [(self.model_version, self.game.stringRepresentation(board)) for board in boards]
+        results = [eval_cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            pi, v = self._predict_on_batch(np.asarray([boards[i] for i in missing]))
+            for j, i in enumerate(missing):
+                results[i] = (pi[j], v[j])
+                eval_cache.put(keys[i], results[i])
+
+        return np.asarray([pi for pi, _ in results]), np.asarray([v for _, v in results])
+
+    def _predict_on_batch(self, boards):
+        """
+        Run the model on a batch of board states, without the evaluation cache.
+
+        :param boards: np array of board states.
+        :return: tuple (policies, values).
+        """
+        # predict_on_batch skips the per-call setup of model.predict
+        pi, v = self.nnet.model.predict_on_batch(boards)
+
+        return np.asarray(pi), np.asarray(v)[:, 0]
 
     def save_checkpoint(self, folder='checkpoint', filename='checkpoint.keras'):
         """
@@ -116,5 +276,6 @@ class NNetWrapper(NeuralNet):
         if not os.path.exists(filepath):
             raise Exception(f"No model in path {filepath}")
         self.nnet.model = tf.keras.models.load_model(filepath, compile=False)  # Load the entire model (architecture + weights)
+        self._weights_changed()
         # Compile the model after loading
         self.nnet.model.compile(loss=['categorical_crossentropy', 'mean_squared_error'], optimizer=Adam(self.args.lr))
@@ -0,0 +1,96 @@
+import os
+import sys
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+sys.path.append('../..')
+from utils import *
+from NeuralNet import Evaluator
+
+# Arguments for inference
+args = dotdict({
+    'num_threads': None,  # Threads of the TFLite interpreter (None = TFLite default)
+})
+
+class TFLiteNetWrapper(Evaluator):
+    """
+    Evaluator running a model exported by gomoku/NN/export.py with the TFLite interpreter.
+
+    It skips the per-call overhead of keras' model.predict, and runs the float16 or int8 quantized exports
+    on CPU. It loads .tflite files with load_checkpoint, so it can be given to MCTS, Arena players and the
+    move server in place of an NNetWrapper. To train or save, use the NNetWrapper and export it again.
+    """
+
+    def __init__(self, game):
+        """
+        :param game: The game instance (the board size is read from the loaded model).
+        """
+        self.game = game
+        self.args = args
+        self.interpreter = None
+        self.lock = threading.Lock()  # The interpreter runs one batch at a time
+
+    def load_checkpoint(self, folder='checkpoint', filename='checkpoint.tflite'):
+        """
+        Load an exported model.
+
+        :param folder: Directory where the model is located.
+        :param filename: Name of the .tflite file.
+        """
+        filepath = os.path.join(folder, filename)
+        if not os.path.exists(filepath):
+            raise Exception(f"No model in path {filepath}")
+        self.interpreter = tf.lite.Interpreter(model_path=filepath, num_threads=self.args.num_threads)
+        self.interpreter.allocate_tensors()
+
+        board_input = self.interpreter.get_input_details()[0]
+        self.input_index = board_input['index']
+        self.board_x, self.board_y = board_input['shape'][1:3]
+        self.action_size = self.board_x * self.board_y
+        # The policy output has one entry per action, the value output a single one
+        for output in self.interpreter.get_output_details():
+            if output['shape'][-1] == 1:
+                self.v_index = output['index']
+            else:
+                self.pi_index = output['index']
+        self.batch_size = 1
+
+    def _run(self, boards):
+        """
+        Run the interpreter on a batch of board states.
+
+        :param boards: np array of board states.
+        :return: tuple (policies, values).
+        """
+        boards = np.asarray(boards, dtype=np.float32)
+        with self.lock:
+            if len(boards) != self.batch_size:
+                self.interpreter.resize_tensor_input(self.input_index, boards.shape)
+                self.interpreter.allocate_tensors()
+                self.batch_size = len(boards)
+            self.interpreter.set_tensor(self.input_index, boards)
+            self.interpreter.invoke()
+            pi = self.interpreter.get_tensor(self.pi_index).copy()
+            v = self.interpreter.get_tensor(self.v_index).copy()
+        return pi, v[:, 0]
+
+    def predict(self, board):
+        """
+        Predict the policy and value for a given board state.
+
+        :param board: np array representing the board state.
+        :return: tuple (policy, value) where policy is the action probabilities and value is the game outcome.
+        """
+        pi, v = self._run(np.asarray(board)[np.newaxis])
+        return pi[0], v[0]
+
+    def predict_batch(self, boards):
+        """
+        Predict the policies and values for several board states in one interpreter call.
+
+        :param boards: list or np array of board states.
+        :return: tuple (policies, values) with one row of action probabilities and one value per board.
+        """
+        return self._run(boards)
@@ -0,0 +1,155 @@
+"""
+Export a keras checkpoint (as written by NNetWrapper.save_checkpoint) to a TFLite model for TFLiteNetWrapper,
+check how far its predictions drift from the keras model on replay positions, and compare their latencies.
+
+Run it from the repository root, e.g.:
+    python -m gomoku.NN.export temp/best.weights.keras temp/best.tflite --quantize float16
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+
+sys.path.append('../..')
+from ReplayBuffer import ReplayBuffer
+from .TFLiteNet import TFLiteNetWrapper
+
+QUANTIZATIONS = ('dynamic', 'float16', 'int8')
+
+def export_tflite(model, filepath, quantize=None, representative_boards=None):
+    """
+    Convert a keras model to a TFLite file. Inputs and outputs stay float32 whatever the quantization.
+
+    :param model: The keras model.
+    :param filepath: Path of the .tflite file to write.
+    :param quantize: None (float32), 'dynamic' (int8 weights), 'float16' (float16 weights) or 'int8'
+                     (int8 weights and activations, calibrated on representative_boards).
+    :param representative_boards: np array of typical board states, required for 'int8'.
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize == 'dynamic':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif quantize == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == 'int8':
+        if representative_boards is None:
+            raise ValueError("int8 quantization needs representative boards to calibrate the activations")
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([board[np.newaxis].astype(np.float32)] for board in representative_boards)
+    elif quantize is not None:
+        raise ValueError(f"Unknown quantization {quantize}, expected one of {QUANTIZATIONS}")
+
+    tflite_model = converter.convert()
+    with open(filepath, 'wb') as f:
+        f.write(tflite_model)
+    print(f"Exported {filepath} ({len(tflite_model) / 2 ** 20:.1f} MB)")
+
+def replay_boards(folder, count, seed=0):
+    """
+    Sample board states from a replay buffer.
+
+    :param folder: Folder of the ReplayBuffer.
+    :param count: Maximum number of boards.
+    :return: np array of up to count boards, None if the replay buffer is empty.
+    """
+    segments = ReplayBuffer(folder, maxSegments=None).load()  # Only read, so no eviction limit
+    if not segments:
+        return None
+    boards = np.concatenate([boards for boards, _, _ in segments])
+    rows = np.random.default_rng(seed).choice(len(boards), min(count, len(boards)), replace=False)
+    return boards[np.sort(rows)].astype(np.float32)
+
+def check_drift(model, net, boards, batch_size=64):
+    """
+    Compare the predictions of an exported net with those of the keras model it was exported from.
+
+    :param model: The keras model.
+    :param net: The TFLiteNetWrapper of the export.
+    :param boards: np array of board states.
+    :return: dict with the max and mean absolute errors of the policies and values, and the fraction of
+             boards where both pick the same most likely move.
+    """
+    keras_pis, keras_vs, net_pis, net_vs = [], [], [], []
+    for start in range(0, len(boards), batch_size):
+        batch = boards[start:start + batch_size]
+        pi, v = model.predict_on_batch(batch)
+        keras_pis.append(np.asarray(pi))
+        keras_vs.append(np.asarray(v)[:, 0])
+        pi, v = net.predict_batch(batch)
+        net_pis.append(pi)
+        net_vs.append(v)
+    keras_pis, keras_vs = np.concatenate(keras_pis), np.concatenate(keras_vs)
+    net_pis, net_vs = np.concatenate(net_pis), np.concatenate(net_vs)
+
+    pi_errors = np.abs(keras_pis - net_pis)
+    v_errors = np.abs(keras_vs - net_vs)
+    return {
+        'policy_max_error': float(pi_errors.max()),
+        'policy_mean_error': float(pi_errors.mean()),
+        'value_max_error': float(v_errors.max()),
+        'value_mean_error': float(v_errors.mean()),
+        'move_agreement': float(np.mean(keras_pis.argmax(axis=1) == net_pis.argmax(axis=1))),
+    }
+
+def time_per_call(fn, inputs, repeats):
+    """
+    :return: Mean seconds per call of fn over repeats calls, cycling through inputs, after one warm-up call.
+    """
+    fn(inputs[0])
+    start = time.perf_counter()
+    for i in range(repeats):
+        fn(inputs[i % len(inputs)])
+    return (time.perf_counter() - start) / repeats
+
+def compare_latency(model, net, boards, repeats=100, batch_size=8):
+    """
+    Time the keras model and the exported net on single boards, as in MCTS.search, and on batches, as in
+    MCTS.searchBatch.
+
+    :return: dict of milliseconds per call.
+    """
+    batches = [boards[i:i + batch_size] for i in range(0, len(boards) - batch_size + 1, batch_size)] or [boards]
+    single = boards[:, np.newaxis]
+    latencies = {
+        'keras model.predict, 1 board': time_per_call(lambda b: model.predict(b, verbose=False), single, repeats),
+        'keras predict_on_batch, 1 board': time_per_call(model.predict_on_batch, single, repeats),
+        'tflite, 1 board': time_per_call(net.predict_batch, single, repeats),
+        f'keras predict_on_batch, {len(batches[0])} boards': time_per_call(model.predict_on_batch, batches, repeats),
+        f'tflite, {len(batches[0])} boards': time_per_call(net.predict_batch, batches, repeats),
+    }
+    return {name: seconds * 1000 for name, seconds in latencies.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description='Export a keras checkpoint to TFLite')
+    parser.add_argument('checkpoint', help='keras checkpoint, e.g. temp/best.weights.keras')
+    parser.add_argument('output', help='TFLite file to write, e.g. temp/best.tflite')
+    parser.add_argument('--quantize', choices=QUANTIZATIONS, default=None, help='weight (and activation) quantization')
+    parser.add_argument('--replay', default='./temp/replay', help='replay buffer to calibrate and check the export on')
+    parser.add_argument('--positions', type=int, default=1000, help='number of replay positions to use')
+    parser.add_argument('--repeats', type=int, default=100, help='calls per latency measurement')
+    cli = parser.parse_args()
+
+    model = tf.keras.models.load_model(cli.checkpoint, compile=False)
+    boards = replay_boards(cli.replay, cli.positions)
+    if boards is None:
+        print(f"No replay positions in {cli.replay}, checking on random positions instead")
+        board_x, board_y = model.input_shape[1:3]
+        boards = np.random.default_rng(0).choice([-1, 0, 0, 0, 1], size=(cli.positions, board_x, board_y)).astype(np.float32)
+
+    export_tflite(model, cli.output, cli.quantize, boards)
+    net = TFLiteNetWrapper(None)
+    net.load_checkpoint(*os.path.split(cli.output))
+
+    print(f"Drift on {len(boards)} positions:")
+    for name, value in check_drift(model, net, boards).items():
+        print(f"  {name}: {value:.6f}")
+    print("Latency:")
+    for name, ms in compare_latency(model, net, boards, cli.repeats).items():
+        print(f"  {name}: {ms:.2f} ms")
+
+if __name__ == '__main__':
+    main()
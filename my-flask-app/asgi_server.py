@@ -0,0 +1,156 @@
+"""
+Asyncio (ASGI) entry point of the move server, with the same /move contract as server.py.
+
+One event loop serves all games. The model is loaded once and only called
+from the thread of a MicroBatcher, which batches the boards of all
+concurrent requests. MCTS searches run on a pool of search threads, so
+neither a search nor a model call blocks the loop. The search trees of the
+games live in a SessionCache bounded in size and in idle time.
+
+Run it with uvicorn:
+    python asgi_server.py --port 5000
+or
+    uvicorn asgi_server:app --port 5000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import server
+
+log = logging.getLogger(__name__)
+
+# The model is shared with server.py; its batcher is the dedicated inference thread
+server.enable_batching(int(os.environ.get('MOVE_BATCH_SIZE', 32)), float(os.environ.get('MOVE_MAX_WAIT_MS', 2.0)) / 1000)
+search_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('MOVE_SEARCH_THREADS', 8)), thread_name_prefix='search')
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-methods', b'POST, OPTIONS'),
+    (b'access-control-allow-headers', b'Content-Type'),
+]
+
+
+class SessionCache():
+    """
+    The server.Session of each game, holding at most maxsize of them. A
+    session idle for more than ttl seconds is dropped, and so is the least
+    recently used one when the cache is full. Only used from the event loop.
+    """
+
+    def __init__(self, maxsize=1000, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sessions = OrderedDict()  # session id -> (Session, time of last use), least recently used first
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def get(self, session_id):
+        """
+        Returns the Session of session_id, creating it if it does not exist or has expired.
+        """
+        now = time.monotonic()
+        while self.sessions:
+            oldest, (_, last_used) = next(iter(self.sessions.items()))
+            if now - last_used <= self.ttl:
+                break
+            del self.sessions[oldest]
+
+        session, _ = self.sessions.get(session_id, (None, None))
+        if session is None:
+            session = server.Session()
+        self.sessions[session_id] = (session, now)
+        self.sessions.move_to_end(session_id)
+        if len(self.sessions) > self.maxsize:
+            self.sessions.popitem(last=False)
+        return session
+
+
+sessions = SessionCache(int(os.environ.get('MOVE_MAX_SESSIONS', 1000)), float(os.environ.get('MOVE_SESSION_TTL', 600)))
+
+
+async def get_move(data):
+    board_state = data['board']
+    log.debug('Received board state: %s', board_state)
+    loop = asyncio.get_running_loop()
+    if 'sims' in data or 'timeMs' in data:
+        session_id = data.get('session')
+        session = server.Session() if session_id is None else sessions.get(session_id)
+        budget = server.search_budget(board_state, data.get('sims'), data.get('timeMs'))
+        move = await loop.run_in_executor(search_executor, session.search, *budget)
+    else:
+        board = np.asarray(board_state, dtype=np.float32).reshape((server.board_size, server.board_size))
+        if server.game_over(board):
+            return {'move': None}
+        move = await loop.run_in_executor(search_executor, server.game.getForcedMove, board, 1)  # Wins, blocks and VCFs
+        if move is None:
+            policy, value = await asyncio.wrap_future(server.batcher.submit(board))
+            move = int(np.argmax(policy))
+    log.debug('Predicted move: %s', move)
+    return {'move': move}
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def respond(send, status, payload=None):
+    body = b'' if payload is None else json.dumps(payload).encode()
+    headers = CORS_HEADERS + [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def app(scope, receive, send):
+    """
+    The ASGI application: POST /move with {'board': ...} returns {'move': int}, or {'move': null} if the
+    game is already won or drawn.
+    """
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                search_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['path'] != '/move':
+        return await respond(send, 404, {'error': 'not found'})
+    if scope['method'] == 'OPTIONS':  # CORS preflight
+        return await respond(send, 204)
+    if scope['method'] != 'POST':
+        return await respond(send, 405, {'error': 'method not allowed'})
+
+    try:
+        data = json.loads(await read_body(receive))
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or 'board' not in data:
+        return await respond(send, 400, {'error': "expected a JSON object with a 'board'"})
+    await respond(send, 200, await get_move(data))
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='Gomoku move server (asyncio)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    cli = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(app, host=cli.host, port=cli.port)
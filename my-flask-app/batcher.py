@@ -0,0 +1,63 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-board requests into batches for the model.
+
+    A background thread takes the first waiting board, then keeps collecting
+    boards until it has max_batch_size of them or max_wait seconds have
+    passed, calls predict_fn once on the stacked boards and hands every
+    request its row of the result.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait=0.002):
+        """
+        :param predict_fn: Function mapping an array of boards to an array with one result row per board.
+        :param max_batch_size: Largest number of boards passed to predict_fn at once.
+        :param max_wait: Seconds to wait for more boards after the first one of a batch.
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='MicroBatcher', daemon=True)
+        self.thread.start()
+
+    def submit(self, board):
+        """
+        Queue a board for prediction.
+
+        :param board: np array of one board state.
+        :return: Future whose result is the row of predict_fn for this board.
+        """
+        future = Future()
+        self.requests.put((board, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                results = self.predict_fn(np.stack([board for board, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,88 @@
+"""
+Load test of a running move server, using the standard library only.
+
+Posts random positions to /move from concurrent threads and reports the
+throughput and latency percentiles. Run it against server.py and
+asgi_server.py in turn to compare them, e.g.:
+    python load_test.py --url http://127.0.0.1:5000/move --concurrency 32 --requests 1000
+    python load_test.py --url http://127.0.0.1:5000/move --sims 100 --games 16
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.request
+
+
+def random_board(board_size, rng):
+    """
+    A random canonical position: equal numbers of stones of both players, or one more of the opponent.
+    """
+    stones = rng.randrange(0, board_size * board_size // 4) * 2 + rng.randrange(2)
+    board = [0] * (board_size * board_size)
+    for i, square in enumerate(rng.sample(range(len(board)), stones)):
+        board[square] = -1 if i % 2 == 0 else 1
+    return board
+
+
+def post_move(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())['move']
+
+
+def worker(cli, worker_id, counter, latencies, errors, lock):
+    rng = random.Random(worker_id)
+    session = f'load-test-{worker_id % cli.games}' if cli.games else None
+    while True:
+        with lock:
+            if counter[0] >= cli.requests:
+                return
+            counter[0] += 1
+        payload = {'board': random_board(cli.board_size, rng)}
+        if cli.sims:
+            payload['sims'] = cli.sims
+            if session is not None:
+                payload['session'] = session
+        start = time.perf_counter()
+        try:
+            post_move(cli.url, payload)
+        except Exception as e:
+            with lock:
+                errors.append(e)
+            continue
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test of the Gomoku move server')
+    parser.add_argument('--url', default='http://127.0.0.1:5000/move')
+    parser.add_argument('--concurrency', type=int, default=16, help='number of clients sending requests at once')
+    parser.add_argument('--requests', type=int, default=500, help='total number of requests')
+    parser.add_argument('--board-size', type=int, default=20)
+    parser.add_argument('--sims', type=int, default=0, help='ask for an MCTS search of that many simulations (0 = policy only)')
+    parser.add_argument('--games', type=int, default=0, help='spread searches over that many sessions (0 = no session)')
+    cli = parser.parse_args()
+
+    counter, latencies, errors, lock = [0], [], [], threading.Lock()
+    threads = [threading.Thread(target=worker, args=(cli, i, counter, latencies, errors, lock)) for i in range(cli.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f'{len(latencies)} requests in {elapsed:.2f}s: {len(latencies) / elapsed:.1f} requests/s, {len(errors)} errors')
+    if latencies:
+        for p in (50, 90, 99):
+            print(f'p{p} latency: {latencies[min(len(latencies) - 1, len(latencies) * p // 100)] * 1000:.1f} ms')
+    if errors:
+        print('First error:', errors[0])
+
+
+if __name__ == '__main__':
+    main()
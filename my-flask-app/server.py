@@ -1,29 +1,214 @@
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import numpy as np
 import tensorflow as tf
 
+from batcher import MicroBatcher
+
+sys.path.append('..')  # Add the repository root to the system path for imports
+from MCTS import MCTS
+from NeuralNet import Evaluator
+from gomoku.Gomoku import GomokuGame
+from gomoku.NN.TFLiteNet import TFLiteNetWrapper
+from utils import LRUCache, dotdict
+
+log = logging.getLogger(__name__)
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Load the trained model
-model = tf.keras.models.load_model('../temp/best.weights.h5', compile=False)
+# Load the trained model: a keras model, or a .tflite export of one (see gomoku/NN/export.py)
+model_path = os.environ.get('MODEL_PATH', '../temp/best.weights.h5')
+if model_path.endswith('.tflite'):
+    tflite_net = TFLiteNetWrapper(None)
+    tflite_net.load_checkpoint(*os.path.split(model_path))
+    board_size = tflite_net.board_x
+    predict_batch = tflite_net.predict_batch
+else:
+    model = tf.keras.models.load_model(model_path, compile=False)
+    board_size = model.input_shape[1]  # The model takes (batch, n, n) boards
+
+    # Compiled once for any batch size, so requests do not pay for model.predict's per-call setup
+    @tf.function(input_signature=[tf.TensorSpec((None, board_size, board_size), tf.float32)])
+    def predict_batch(boards):
+        policy, value = model(boards, training=False)
+        return policy, value[:, 0]
+
+def evaluate(boards):
+    """
+    :param boards: np array of board states.
+    :return: list with the (policy, value) of each board.
+    """
+    policies, values = predict_batch(np.asarray(boards, dtype=np.float32))
+    return list(zip(np.asarray(policies), np.asarray(values)))
+
+# Coalesces concurrent requests in production mode, see enable_batching
+batcher = None
+
+def enable_batching(max_batch_size=32, max_wait=0.002):
+    global batcher
+    batcher = MicroBatcher(evaluate, max_batch_size, max_wait)
+
+def evaluate_boards(boards):
+    """
+    Evaluate boards through the batcher when there is one, so that concurrent requests share model calls.
+    """
+    boards = np.asarray(boards, dtype=np.float32)
+    if batcher is None:
+        return evaluate(boards)
+    futures = [batcher.submit(board) for board in boards]
+    return [future.result() for future in futures]
+
+def game_over(board):
+    """
+    :return: True if the game of board is won or drawn, so that there is no move to play.
+    """
+    return game.getGameEnded(np.asarray(board, dtype=np.int8), 1) != 0
 
 # Function to predict the next move
 def predict_move(board_state):
-    board = np.array(board_state).reshape((1, 20, 20, 1))  # Adjust shape as needed
-    policy, value = model.predict(board)
+    board = np.asarray(board_state, dtype=np.float32).reshape((board_size, board_size))
+    if game_over(board):
+        return None
+    forced = game.getForcedMove(board, 1)  # Wins, blocks and VCFs need no model
+    if forced is not None:
+        return forced
+    policy, value = evaluate_boards(board[np.newaxis])[0]
     move = np.argmax(policy)
     return int(move)
 
+class ServedNet(Evaluator):
+    """
+    The served model as an Evaluator, so that MCTS can search with it.
+    """
+
+    def predict(self, board):
+        return evaluate_boards(np.asarray(board)[np.newaxis])[0]
+
+    def predict_batch(self, boards):
+        results = evaluate_boards(boards)
+        return np.asarray([pi for pi, _ in results]), np.asarray([v for _, v in results])
+
+game = GomokuGame(board_size, threatDepth=int(os.environ.get('MOVE_VCF_DEPTH', 8)))  # Largest number of fours of a VCF
+mcts_args = dotdict({
+    'cpuct': 1,
+    'threatShortcut': True,  # Play forced moves without searching
+    'numMCTSSims': 100,  # Not used: every search is given its budget
+    'mctsBatchSize': 8,  # Number of leaves evaluated together by the model
+})
+MAX_SIMS = int(os.environ.get('MOVE_MAX_SIMS', 5000))  # Caps on the budget a client can ask for
+MAX_TIME_MS = float(os.environ.get('MOVE_MAX_TIME_MS', 10000))
+
+class Session():
+    """
+    The search tree of one game, kept between the requests of that game.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()  # A game's requests are searched one at a time
+        self.mcts = MCTS(game, ServedNet(game), mcts_args)
+
+    def search(self, board, num_sims, deadline):
+        """
+        :return: The move searched for board, or None if the game of board is over.
+        """
+        if game_over(board):
+            return None
+        with self.lock:
+            self.follow(board)
+            move = int(np.argmax(self.mcts.getActionProb(board, temp=0, numSims=num_sims, deadline=deadline)))
+            self.mcts.advanceRoot(move)
+            return move
+
+    def follow(self, board):
+        """
+        Move the root of the tree to board if it is the last board searched plus one move of the opponent,
+        else start a new tree.
+        """
+        if self.mcts.rootBoard is None:
+            return
+        # After advanceRoot the root is the board after our move, in the canonical form of the opponent
+        last = -np.asarray(self.mcts.rootBoard).ravel()
+        changed = np.flatnonzero(last != board.ravel())
+        if len(changed) == 1 and last[changed[0]] == 0 and board.ravel()[changed[0]] == -1:
+            self.mcts.advanceRoot(int(changed[0]))
+        else:
+            self.mcts = MCTS(game, self.mcts.nnet, mcts_args)
+
+sessions = LRUCache(int(os.environ.get('MOVE_MAX_SESSIONS', 1000)))  # Least recently used games are dropped
+sessions_lock = threading.Lock()
+
+def get_session(session_id):
+    with sessions_lock:
+        session = sessions.get(session_id)
+        if session is None:
+            session = Session()
+            sessions.put(session_id, session)
+        return session
+
+def search_budget(board_state, sims=None, time_ms=None):
+    """
+    :param board_state: Canonical board (1 for the player to move, -1 for the opponent).
+    :param sims: Number of simulations, at most MAX_SIMS.
+    :param time_ms: Wall-clock budget of the search in milliseconds, at most MAX_TIME_MS.
+    :return: Arguments (board, num_sims, deadline) of Session.search.
+    """
+    board = np.asarray(board_state, dtype=np.int8).reshape((board_size, board_size))
+    num_sims = MAX_SIMS if sims is None else max(1, min(int(sims), MAX_SIMS))
+    deadline = time.time() + min(float(time_ms), MAX_TIME_MS) / 1000 if time_ms is not None else None
+    return board, num_sims, deadline
+
+def search_move(board_state, session_id=None, sims=None, time_ms=None):
+    """
+    Choose the next move with MCTS, see search_budget.
+
+    :param session_id: Identifier of the game, to reuse its search tree between moves. None searches from scratch.
+    """
+    session = Session() if session_id is None else get_session(session_id)
+    return session.search(*search_budget(board_state, sims, time_ms))
+
 @app.route('/move', methods=['POST'])
 def get_move():
+    """
+    POST {'board': ...} returns {'move': int}, or {'move': null} if the game is already won or drawn.
+    """
     data = request.json
     board_state = data['board']
-    print('Received board state:', board_state)  # Log the received board state
-    move = predict_move(board_state)
-    print('Predicted move:', move)  # Log the predicted move
+    log.debug('Received board state: %s', board_state)  # Log the received board state
+    if 'sims' in data or 'timeMs' in data:
+        # Search with the requested budget, reusing the tree of the game's session if one is given
+        move = search_move(board_state, data.get('session'), data.get('sims'), data.get('timeMs'))
+    else:
+        move = predict_move(board_state)
+    log.debug('Predicted move: %s', move)  # Log the predicted move
     return jsonify({'move': move})
 
+def serve(production=False, host='127.0.0.1', port=5000, max_batch_size=32, max_wait_ms=2.0):
+    """
+    Run the move server. The development mode is Flask's debug server handling one request at a time.
+    The production mode serves requests on threads, batches concurrent predictions and does not log boards.
+    """
+    if production:
+        logging.basicConfig(level=logging.INFO)
+        enable_batching(max_batch_size, max_wait_ms / 1000)
+        app.run(host=host, port=port, debug=False, threaded=True)
+    else:
+        logging.basicConfig(level=logging.DEBUG)
+        app.run(host=host, port=port, debug=True)
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    parser = argparse.ArgumentParser(description='Gomoku move server')
+    parser.add_argument('--production', action='store_true', help='threaded server with request batching')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=32, help='largest batch of boards per model call')
+    parser.add_argument('--max-wait-ms', type=float, default=2.0, help='time to wait for more boards before a model call')
+    cli = parser.parse_args()
+    serve(cli.production, cli.host, cli.port, cli.batch_size, cli.max_wait_ms)
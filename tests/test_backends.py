@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from gomoku.Gomoku import GomokuGame
+
+
+def play_random_game(game, rng, numpy_actions=False):
+    """
+    Plays a random game and returns the (board, player, action, ended) of every move.
+    """
+    board, player = game.getInitBoard(), 1
+    history = []
+    while True:
+        valids = game.getValidMoves(board, player)
+        action = rng.choice(np.flatnonzero(valids))
+        if not numpy_actions:
+            action = int(action)
+        board, player = game.getNextState(board, player, action)
+        ended = game.getGameEnded(board, player, action)
+        history.append((np.asarray(board).copy(), player, int(action), ended))
+        if ended != 0:
+            return history
+
+
+@pytest.mark.parametrize('n', [7, 10, 20])
+@pytest.mark.parametrize('backend', ['array', 'bit'])
+def test_backend_matches_list(n, backend):
+    reference = GomokuGame(n, backend='list')
+    game = GomokuGame(n, backend=backend)
+    for seed in range(3):
+        expected = play_random_game(reference, np.random.default_rng(seed))
+        actual = play_random_game(game, np.random.default_rng(seed))
+        assert len(actual) == len(expected)
+        for (b1, p1, a1, e1), (b2, p2, a2, e2) in zip(expected, actual):
+            assert np.array_equal(b1, b2)
+            assert (p1, a1, e1) == (p2, a2, e2)
+
+
+@pytest.mark.parametrize('backend', ['list', 'array', 'bit'])
+def test_numpy_int_actions(backend):
+    # Past 7x7 the bit index of the last squares is above 63
+    game = GomokuGame(10, backend=backend)
+    board = game.getInitBoard()
+    board, player = game.getNextState(board, 1, np.int64(95))
+    assert np.asarray(board)[9, 5] == 1
+    assert game.getValidMoves(board, player)[95] == 0
+    assert game.getValidMoves(board, player).sum() == 99
+    assert game.getGameEnded(board, player, np.int64(95)) == 0
+
+
+@pytest.mark.parametrize('backend', ['list', 'array', 'bit'])
+def test_numpy_int_random_game(backend):
+    reference = play_random_game(GomokuGame(10, backend='list'), np.random.default_rng(0))
+    actual = play_random_game(GomokuGame(10, backend=backend), np.random.default_rng(0), numpy_actions=True)
+    assert [(a, e) for _, _, a, e in actual] == [(a, e) for _, _, a, e in reference]
+    assert np.array_equal(actual[-1][0], reference[-1][0])
+
+
+@pytest.mark.parametrize('backend', ['list', 'array', 'bit'])
+def test_win_and_string_representation(backend):
+    game = GomokuGame(10, backend=backend)
+    board, player = game.getInitBoard(), 1
+    for action in [11, 0, 22, 1, 33, 2, 44, 3]:
+        board, player = game.getNextState(board, player, action)
+        assert game.getGameEnded(board, player, action) == 0
+    board, player = game.getNextState(board, player, 55)
+    assert game.getGameEnded(board, player, 55) == -1  # player 1 completed the diagonal, -1 is to move
+    assert game.getGameEnded(board, 1) == 1
+    other, _ = game.getNextState(game.getInitBoard(), 1, 11)
+    assert game.stringRepresentation(other) != game.stringRepresentation(game.getInitBoard())
+
+
+@pytest.mark.parametrize('backend', ['list', 'array', 'bit'])
+def test_draw_on_full_board(backend):
+    # Pairs of columns alternating colors, shifted by one column every two rows: no five in any direction
+    n = 6
+    pieces = np.array([[1 if (y + x // 2) // 2 % 2 == 0 else -1 for y in range(n)] for x in range(n)], dtype=np.int8)
+    game = GomokuGame(n, backend=backend)
+    last = pieces[n - 1, n - 1]
+    pieces[n - 1, n - 1] = 0
+    board, player = game.getNextState(pieces, last, n * n - 1)
+    assert game.getGameEnded(board, player, n * n - 1) == 1e-4
+    assert game.getGameEnded(board, player) == 1e-4
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from gomoku.Gomoku import GomokuGame
+from gomoku.GomokuCandidates import Candidates
+
+
+def near_stones(pieces, radius):
+    """
+    The empty squares within radius, in rows and in columns, of a stone, square by square.
+    """
+    n = len(pieces)
+    near = np.zeros((n, n), dtype=bool)
+    for x, y in np.argwhere(pieces != 0):
+        near[max(0, x - radius):x + radius + 1, max(0, y - radius):y + radius + 1] = True
+    return near & (pieces == 0)
+
+
+@pytest.mark.parametrize('radius', [1, 2, 3])
+def test_mask_matches_dilation(radius):
+    candidates = Candidates(9, radius)
+    rng = np.random.default_rng(radius)
+    for density in (0.02, 0.1, 0.5):
+        pieces = np.where(rng.random((9, 9)) < density, rng.choice([1, -1], (9, 9)), 0).astype(np.int8)
+        assert np.array_equal(candidates.mask(pieces), near_stones(pieces, radius))
+
+
+@pytest.mark.parametrize('radius', [1, 2])
+def test_incremental_candidates_match_mask(radius):
+    game = GomokuGame(10, candidateRadius=radius)
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        board, player = game.getInitBoard(), 1
+        while game.getGameEnded(board, player) == 0:
+            canonical = game.getCanonicalForm(board, player)
+            expected = near_stones(np.asarray(board), radius)
+            assert np.array_equal(board.candidates, expected)
+            assert np.array_equal(canonical.candidates, expected)
+            moves = game.getCandidateMoves(canonical, 1)
+            if expected.any():
+                assert np.array_equal(moves, expected.ravel().astype(np.int8))
+            action = int(rng.choice(np.flatnonzero(moves)))
+            board, player = game.getNextState(board, player, action)
+
+
+def test_empty_board_and_single_stone():
+    candidates = Candidates(5, 1)
+    empty = np.zeros((5, 5), dtype=np.int8)
+    assert np.flatnonzero(candidates.moves(empty)).tolist() == [12]  # the center
+    corner = empty.copy()
+    corner[0, 0] = 1
+    assert np.flatnonzero(candidates.moves(corner)).tolist() == [1, 5, 6]
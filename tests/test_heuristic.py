@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from Arena import Arena
+from gomoku.Gomoku import GomokuGame
+from gomoku.GomokuHeuristic import Heuristic, HeuristicNet, HeuristicPlayer
+
+
+def board_with(stones, n=9):
+    pieces = np.zeros((n, n), dtype=np.int8)
+    for (x, y), color in stones.items():
+        pieces[x, y] = color
+    return pieces
+
+
+# Positions on a 9x9 board, player 1 (the AI of the JS front end) to move, with the (attack, defense) scores
+# of the five best squares and the move chosen by computer_move in traditional_game_implementation/scripts1.js
+JS_POSITIONS = [
+    ({(4, 4): 1},
+     {30: (3, 0), 31: (3, 0), 32: (3, 0), 39: (3, 0), 41: (3, 0)}, 30),
+    ({(4, 3): 1, (4, 4): 1, (4, 5): 1, (2, 2): -1},
+     {38: (64, 2), 42: (64, 0), 37: (10, 0), 43: (10, 0), 31: (9, 0)}, 38),
+    ({(3, 2): -1, (3, 4): -1, (3, 5): -1, (5, 5): 1, (6, 6): 1},
+     {30: (4, 64), 40: (12, 6), 33: (2, 12), 70: (12, 0), 28: (0, 10)}, 30),
+    ({(0, 1): 1, (0, 2): 1, (0, 3): 1, (0, 4): 1, (0, 0): -1, (5, 5): -1, (6, 5): -1, (7, 5): -1},
+     {5: (256, 0), 41: (2, 64), 32: (2, 10), 6: (10, 0), 77: (0, 10)}, 5),
+    ({(2, 2): -1, (3, 3): -1, (4, 4): -1, (2, 6): 1, (3, 5): 1, (5, 3): 1},
+     {50: (4, 64), 10: (0, 64), 22: (5, 7), 60: (2, 10), 0: (0, 10)}, 50),
+]
+
+
+@pytest.mark.parametrize('stones, scores, move', JS_POSITIONS)
+def test_scores_match_the_js_front_end(stones, scores, move):
+    pieces = board_with(stones)
+    heuristic = Heuristic(9)
+    attack, defense = heuristic.scores(pieces)
+    for action, expected in scores.items():
+        assert (attack.ravel()[action], defense.ravel()[action]) == expected
+    total = (attack + defense).ravel()
+    assert sorted(total, reverse=True)[:len(scores)] == sorted((a + d for a, d in scores.values()), reverse=True)
+    assert heuristic.best_move(pieces) == move
+
+
+def test_occupied_squares_score_zero():
+    pieces = board_with(JS_POSITIONS[1][0])
+    attack, defense = Heuristic(9).scores(pieces)
+    assert not attack[pieces != 0].any() and not defense[pieces != 0].any()
+
+
+def test_symmetric_positions_score_symmetrically():
+    pieces = board_with(JS_POSITIONS[2][0])
+    heuristic = Heuristic(9)
+    attack, defense = heuristic.scores(pieces)
+    for k in range(4):
+        rotated_attack, rotated_defense = heuristic.scores(np.rot90(pieces, k))
+        assert np.array_equal(rotated_attack, np.rot90(attack, k))
+        assert np.array_equal(rotated_defense, np.rot90(defense, k))
+
+
+def test_empty_board_plays_the_center():
+    assert Heuristic(9).best_move(np.zeros((9, 9), dtype=np.int8)) == 40
+
+
+def test_player_beats_random():
+    game = GomokuGame(9)
+    rng = np.random.default_rng(0)
+    randomPlayer = lambda board: int(rng.choice(np.flatnonzero(game.getValidMoves(board, 1))))
+    heuristicWins, randomWins, _ = Arena(HeuristicPlayer(game), randomPlayer, game).playGames(10)
+    assert heuristicWins == 10 and randomWins == 0
+
+
+def test_net_policy_and_value():
+    game = GomokuGame(9)
+    net = HeuristicNet(game)
+    pieces = board_with(JS_POSITIONS[3][0])
+    pi, v = net.predict(pieces)
+    assert abs(pi.sum() - 1) < 1e-9
+    assert not pi[pieces.ravel() != 0].any()
+    assert int(np.argmax(pi)) == 5
+    assert v > 0.5  # player 1 wins next move
+    pis, vs = net.predict_batch([pieces, -pieces])
+    assert np.allclose(pis[0], pi) and vs[1] < 0
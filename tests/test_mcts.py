@@ -0,0 +1,94 @@
+import time
+
+import numpy as np
+import pytest
+
+from MCTS import MCTS
+from NeuralNet import Evaluator
+from gomoku.Gomoku import GomokuGame
+from utils import dotdict
+
+
+class UniformEvaluator(Evaluator):
+    """
+    Uniform policy and a value of 0, counting the boards it evaluates.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.boards = 0
+
+    def predict(self, board):
+        self.boards += 1
+        return np.full(self.game.getActionSize(), 1. / self.game.getActionSize()), 0.
+
+
+def make_mcts(n, numSims, batchSize):
+    game = GomokuGame(n)
+    mcts = MCTS(game, UniformEvaluator(game), dotdict({'numMCTSSims': numSims, 'cpuct': 1, 'mctsBatchSize': batchSize}))
+    return game, mcts
+
+
+def root_node(game, mcts, board):
+    return mcts.nodes[game.stringRepresentation(board)]
+
+
+def check_statistics(mcts):
+    # No virtual loss is left behind: the visits of every expanded node are the sum of its edge visits
+    for node in mcts.nodes.values():
+        if node.actions is not None:
+            assert node.n == node.N.sum()
+            assert (node.N >= 0).all()
+
+
+@pytest.mark.parametrize('batchSize', [1, 4, 8])
+@pytest.mark.parametrize('numSims', [2, 25, 100])
+def test_runs_every_simulation(numSims, batchSize):
+    game, mcts = make_mcts(10, numSims, batchSize)
+    board = game.getInitBoard()
+    mcts.getActionProb(board)
+    # The first simulation expands the root, every other one visits one of its edges
+    assert root_node(game, mcts, board).N.sum() == numSims - 1
+    check_statistics(mcts)
+
+
+@pytest.mark.parametrize('batchSize', [1, 8])
+def test_search_continues_from_kept_statistics(batchSize):
+    game, mcts = make_mcts(10, 25, batchSize)
+    board = game.getInitBoard()
+    mcts.getActionProb(board)
+    mcts.getActionProb(board, numSims=40)
+    assert root_node(game, mcts, board).N.sum() == 24 + 40
+    check_statistics(mcts)
+
+
+@pytest.mark.parametrize('batchSize', [1, 8])
+def test_small_tree_near_the_end(batchSize):
+    # Few leaves are left, so batched walks keep ending on the same ones
+    game, mcts = make_mcts(5, 50, batchSize)
+    board = np.array([1, -1, 1, -1, 1, -1, 1, -1, 1, -1, -1, 1, -1, 1, -1, 1, -1, 1, -1, 1, 0, 0, 0, 0, 0],
+                     dtype=np.int8).reshape(5, 5)
+    probs = mcts.getActionProb(board)
+    assert root_node(game, mcts, board).N.sum() == 49
+    assert sum(probs[:20]) == 0
+    check_statistics(mcts)
+
+
+def test_batches_share_network_calls():
+    game, mcts = make_mcts(10, 65, 8)
+    mcts.getActionProb(game.getInitBoard())
+    assert mcts.nnet.boards == 65  # one board per simulation, none evaluated twice
+
+
+
+@pytest.mark.parametrize('batchSize', [1, 8])
+def test_deadline_and_single_simulation_visit_the_root(batchSize):
+    game, mcts = make_mcts(10, 100, batchSize)
+    board = game.getInitBoard()
+    board[5, 5] = -1
+    probs = np.asarray(mcts.getActionProb(board, deadline=time.time() - 1))
+    assert abs(probs.sum() - 1) < 1e-9 and probs[55] == 0
+    game, mcts = make_mcts(10, 1, batchSize)
+    probs = np.asarray(mcts.getActionProb(board, temp=0))
+    assert probs.sum() == 1 and probs[55] == 0
+    assert root_node(game, mcts, board).N.sum() == 1
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from MCTS import MCTS
+from NeuralNet import Evaluator
+from gomoku.Gomoku import GomokuGame
+from utils import dotdict
+
+
+def random_board(n, rng, density=0.3):
+    return np.where(rng.random((n, n)) < density, rng.choice([1, -1], (n, n)), 0).astype(np.int8)
+
+
+def symmetric_forms(game, board):
+    return [np.asarray(board).ravel()[perm].reshape(game.n, game.n) for perm in game.symmetryPerms]
+
+
+@pytest.mark.parametrize('n', [5, 6, 10])
+def test_symmetry_perms_match_getSymmetries(n):
+    game = GomokuGame(n)
+    board = random_board(n, np.random.default_rng(n))
+    expected = sorted(b.tobytes() for b, _ in game.getSymmetries(board, np.zeros(n * n)))
+    assert sorted(form.tobytes() for form in symmetric_forms(game, board)) == expected
+
+
+@pytest.mark.parametrize('n', [5, 6, 10])
+def test_symmetric_representation_round_trip(n):
+    game = GomokuGame(n)
+    rng = np.random.default_rng(n)
+    for _ in range(20):
+        board = random_board(n, rng)
+        key, perm = game.getSymmetricRepresentation(board)
+        # The key is the form whose action a is the action perm[a] of board
+        assert np.array_equal(np.frombuffer(key, dtype=board.dtype), board.ravel()[perm])
+        assert sorted(perm) == list(range(n * n))
+        for form in symmetric_forms(game, board):
+            formKey, formPerm = game.getSymmetricRepresentation(form)
+            assert formKey == key
+            assert np.array_equal(form.ravel()[formPerm], board.ravel()[perm])
+
+        # Playing action a in the orientation of the key is playing perm[a] on board
+        a = int(rng.choice(np.flatnonzero(np.frombuffer(key, dtype=board.dtype) == 0)))
+        next_board, _ = game.getNextState(board, 1, perm[a])
+        keyed = np.frombuffer(key, dtype=board.dtype).copy()
+        keyed[a] = 1
+        assert np.array_equal(next_board.ravel()[perm], keyed)
+
+
+class CornerEvaluator(Evaluator):
+    """
+    Prefers the squares of low index, so the policy depends on the orientation of the board.
+    """
+
+    def __init__(self, game):
+        self.game = game
+
+    def predict(self, board):
+        pi = np.arange(self.game.getActionSize(), 0, -1, dtype=np.float64)
+        return pi / pi.sum(), 0.
+
+
+def test_symmetric_tt_shares_nodes_between_orientations():
+    game = GomokuGame(7)
+    mcts = MCTS(game, CornerEvaluator(game), dotdict({'numMCTSSims': 30, 'cpuct': 1, 'symmetricTT': True}))
+    board = random_board(7, np.random.default_rng(0), density=0.2)
+    probs = np.asarray(mcts.getActionProb(board, temp=1))
+    for t, form in enumerate(symmetric_forms(game, board)):
+        assert mcts.getKey(form)[0] == mcts.getKey(board)[0]
+        # The statistics of the shared node, read in the orientation of form, are those of board moved along
+        s, perm = mcts.getKey(form)
+        node = mcts.nodes[s]
+        counts = np.zeros(game.getActionSize())
+        counts[perm[node.actions]] = node.N
+        assert np.allclose(counts / counts.sum(), probs[game.symmetryPerms[t]])
@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from gomoku.Gomoku import GomokuGame
+from gomoku.GomokuLogic import Board
+from gomoku.GomokuThreats import Threats
+
+
+def board_with(n, stones):
+    pieces = np.zeros((n, n), dtype=np.int8)
+    for (x, y), color in stones.items():
+        pieces[x, y] = color
+    return pieces
+
+
+def brute_force_wins(pieces, color):
+    """
+    The empty squares completing five for color, by trying every one of them.
+    """
+    n = len(pieces)
+    wins = []
+    for action in np.flatnonzero(pieces.ravel() == 0):
+        board = Board(n, pieces.copy())
+        board.execute_move(divmod(int(action), n), color)
+        if board.is_win_at(divmod(int(action), n)):
+            wins.append(int(action))
+    return wins
+
+
+def test_winning_moves_match_brute_force():
+    threats = Threats(9)
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        pieces = np.where(rng.random((9, 9)) < 0.35, rng.choice([1, -1], (9, 9)), 0).astype(np.int8)
+        for color in (1, -1):
+            assert threats.winning_moves(pieces, color).tolist() == brute_force_wins(pieces, color)
+
+
+def test_win_before_block():
+    pieces = board_with(9, {(0, 0): 1, (0, 1): 1, (0, 2): 1, (0, 3): 1,
+                            (5, 1): -1, (5, 2): -1, (5, 3): -1, (5, 4): -1})
+    assert Threats(9).forced_move(pieces, 1) == 4
+    assert Threats(9).forced_move(pieces, -1) in (45, 50)
+
+
+def test_block():
+    pieces = board_with(9, {(2, 2): -1, (3, 3): -1, (4, 4): -1, (5, 5): -1, (1, 1): 1, (0, 8): 1})
+    assert Threats(9).forced_move(pieces, 1) == 60  # (6, 6), the other end is taken
+
+
+def play_line(pieces, line, color):
+    """
+    Plays a VCF line, attacker and defender alternating, and returns whether the attacker then has five.
+    """
+    n = len(pieces)
+    board = Board(n, pieces.copy())
+    for k, action in enumerate(line):
+        board.execute_move(divmod(action, n), color if k % 2 == 0 else -color)
+    if len(line) % 2 == 0:
+        # Ends with a double threat: one of the attacker's wins is left after the block
+        wins = Threats(n).winning_moves(board.pieces, color)
+        assert len(wins) >= 1
+        board.execute_move(divmod(int(wins[0]), n), color)
+    return board.is_win(color)
+
+
+def test_vcf_found():
+    # An open three on row 4 and two stones over (2, 6) - (3, 6): the fours lead to a double threat
+    pieces = board_with(10, {(4, 3): 1, (4, 4): 1, (4, 5): 1, (2, 6): 1, (3, 6): 1, (0, 0): -1})
+    line = Threats(10).vcf(pieces, 1)
+    assert line is not None
+    assert play_line(pieces, line, 1)
+    for k in range(0, len(line) - 1, 2):
+        # Every defender move blocks the four before it, the only one except after the final double threat
+        board = Board(10, pieces.copy())
+        for j, action in enumerate(line[:k + 1]):
+            board.execute_move(divmod(action, 10), 1 if j % 2 == 0 else -1)
+        wins = Threats(10).winning_moves(board.pieces, 1).tolist()
+        assert (wins == [line[k + 1]]) if k + 2 < len(line) else (line[k + 1] in wins)
+    assert GomokuGame(10, threatDepth=8).getForcedMove(pieces, 1) == line[0]
+
+
+def test_no_vcf_in_a_quiet_position():
+    pieces = board_with(10, {(4, 4): 1, (5, 5): -1, (4, 5): 1, (5, 4): -1})
+    assert Threats(10).vcf(pieces, 1) is None
+    assert Threats(10).forced_move(pieces, 1) is None
+
+
+def test_vcf_bounds():
+    pieces = board_with(10, {(4, 3): 1, (4, 4): 1, (4, 5): 1, (2, 6): 1, (3, 6): 1, (0, 0): -1})
+    assert Threats(10, max_nodes=0).vcf(pieces, 1) is None
+    assert Threats(10).vcf(pieces, 1, depth=0) is None
+    assert Threats(10, vcf_depth=0).forced_move(pieces, 1) is None
+
+
+def test_concurrent_searches_keep_their_node_budget():
+    pieces = board_with(10, {(4, 3): 1, (4, 4): 1, (4, 5): 1, (2, 6): 1, (3, 6): 1, (0, 0): -1})
+    threats = Threats(10)
+    expected = threats.vcf(pieces, 1)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: threats.vcf(pieces, 1), range(64)))
+    assert all(line == expected for line in results)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from gomoku.Gomoku import GomokuGame
+from gomoku.GomokuZobrist import Zobrist
+
+
+@pytest.mark.parametrize('candidateRadius', [None, 2])
+def test_incremental_hashes_match_recompute(candidateRadius):
+    game = GomokuGame(10, zobrist=True, candidateRadius=candidateRadius)
+    zobrist = Zobrist(10)
+    rng = np.random.default_rng(0)
+    seen = {}
+    for _ in range(5):
+        board, player = game.getInitBoard(), 1
+        while game.getGameEnded(board, player) == 0:
+            canonical = game.getCanonicalForm(board, player)
+            # Boards carry their hashes, plain arrays are hashed from scratch
+            assert game.stringRepresentation(board) == zobrist.hashes(np.asarray(board).view(np.ndarray))[0]
+            assert game.stringRepresentation(canonical) == zobrist.hashes(np.asarray(canonical).view(np.ndarray))[0]
+            seen.setdefault(game.stringRepresentation(board), np.asarray(board).tobytes())
+            assert seen[game.stringRepresentation(board)] == np.asarray(board).tobytes()
+
+            action = int(rng.choice(np.flatnonzero(game.getValidMoves(canonical, 1))))
+            board, player = game.getNextState(board, player, action)
+
+
+def test_negated_hash():
+    zobrist = Zobrist(6)
+    board = np.zeros((6, 6), dtype=np.int8)
+    board[1, 2], board[3, 3], board[0, 5] = 1, -1, 1
+    h, hNeg = zobrist.hashes(board)
+    assert zobrist.hashes(-board) == (hNeg, h)
+    assert h != hNeg
+
+
+def test_move_matches_recompute():
+    zobrist = Zobrist(6)
+    board = np.zeros((6, 6), dtype=np.int8)
+    hashes = zobrist.hashes(board)
+    assert hashes == (0, 0)
+    for action, color in [(7, 1), (8, -1), (35, 1), (0, -1)]:
+        hashes = zobrist.move(hashes, action, color)
+        board.ravel()[action] = color
+        assert hashes == zobrist.hashes(board)
+
+
+def test_keys_do_not_depend_on_the_process():
+    assert Zobrist(8).keys == Zobrist(8).keys
+    assert Zobrist(8, seed=1).keys != Zobrist(8).keys
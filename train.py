@@ -14,19 +14,40 @@ args = dotdict({
     'tempThreshold': 15,      # Number of moves for which the temperature is 1.
     'updateThreshold': 0.6,   # During arena playoff, new neural net will be accepted if threshold or more of games are won.
     'maxlenOfQueue': 200000,  # Number of game examples to train the neural networks.
+    'lazySymmetries': True,   # Store each position once and apply a random symmetry per sample during training.
+    'streamTraining': True,   # Stream shuffled training batches from the replay buffer instead of loading all examples.
     'numMCTSSims': 25,        # Number of games moves for MCTS to simulate.
     'arenaCompare': 20,       # Number of games to play during arena play to determine if new net will be accepted.
     'cpuct': 1,
+    'pipelined': False,       # Overlap self-play, training and arena gating; workers switch to each accepted network.
+    'numArenaWorkers': 1,     # Number of processes playing arena games (1 = in this process).
+    'arenaEarlyStop': True,   # Stop the arena as soon as the updateThreshold decision cannot change anymore.
+    'arenaSPRT': False,       # Gate with a sequential probability ratio test; arenaCompare is then the maximum number of games.
+    'sprtElo0': 0,            # SPRT null hypothesis: the new net is at most this much Elo stronger.
+    'sprtElo1': 70,           # SPRT alternative hypothesis: at least this much stronger (70 Elo ~ 60% wins).
+    'sprtAlpha': 0.05,        # SPRT probability of accepting a new net that is not stronger.
+    'sprtBeta': 0.05,         # SPRT probability of rejecting a new net that is stronger.
+    'numSelfPlayWorkers': 1,  # Number of processes playing self-play episodes (1 = in this process).
+    'useInferenceServer': False,  # Self-play workers send boards to one batched network in this process instead of loading their own.
+    'inferenceBatchSize': 256,    # Largest batch of boards the inference server evaluates at once.
+    'inferenceTimeout': 0.002,    # Seconds the inference server waits for more boards before evaluating a batch.
+    'seed': None,             # Seed for self-play episodes; with a seed, results do not depend on numSelfPlayWorkers.
+    'candidateRadius': None,  # Only search the empty squares within this distance of a stone (None = all valid moves).
+    'threatShortcut': False,  # Play wins, forced blocks and VCF moves without MCTS simulations.
+    'vcfDepth': 8,            # Largest number of fours of a VCF found by the threat shortcut.
+    'symmetricTT': False,     # Share MCTS statistics and network evaluations between symmetrical boards.
+    'mctsBatchSize': 8,       # Number of MCTS leaves evaluated together by the neural network (1 = one at a time).
 
     'checkpoint': './temp/',
     'load_model': False,
     'load_folder_file': ('./temp/', 'best.weights.h5'),
     'numItersForTrainExamplesHistory': 20,
+    'clearReplayBuffer': False,  # Delete the replay buffer of an earlier run instead of moving it to a timestamped folder.
 })
 
 def main():
     log.info('Loading %s...', Game.__name__)
-    g = Game(10)
+    g = Game(10, candidateRadius=args.candidateRadius, threatDepth=args.vcfDepth if args.threatShortcut else None)
 
     log.info('Loading %s...', nn.__name__)
     nnet = nn(g)
@@ -1,3 +1,6 @@
+from collections import OrderedDict
+
+
 class AverageMeter(object):
     """From https://github.com/pytorch/examples/blob/master/imagenet/main.py"""
 
@@ -19,4 +22,36 @@ class AverageMeter(object):
 
 class dotdict(dict):
     def __getattr__(self, name):
-        return self[name]
\ No newline at end of file
+        return self[name]
+
+
+class LRUCache(object):
+    """A dict holding at most maxsize entries, evicting the least recently used one. Counts hits and misses."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        lookups = self.hits + self.misses
+        return f'{len(self.data)} entries, {self.hits} hits / {lookups} lookups ({self.hits / max(lookups, 1):.1%})'
+
+    def get(self, key):
+        value = self.data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)